@@ -1,5 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+from django.db import transaction
 from django.utils.html import format_html
 
 from .models import CustomUser
@@ -18,6 +19,8 @@ class CustomUserAdmin(UserAdmin):
         'is_staff',
         'is_superuser',
     )
+    list_per_page = 100
+    show_full_result_count = False
     fieldsets = (
         (
             None, {
@@ -98,6 +101,20 @@ class CustomUserAdmin(UserAdmin):
         )
 
     storage_usage_column.short_description = 'Storage usage'
+    storage_usage_column.admin_order_field = 'storage_used'
+
+    def delete_model(self, request, obj):
+        """
+        Delete a user the same way as the API does: the user
+        is deactivated and purge_user_task removes their files
+        in the background (see CustomUser.schedule_deletion).
+        """
+        obj.schedule_deletion()
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            for user in queryset:
+                user.schedule_deletion()
 
 
 admin.site.register(CustomUser, CustomUserAdmin)
@@ -0,0 +1,29 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+from .caching import cache_token_user, get_cached_token_user
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication with the token owner kept in the cache.
+
+    A cache hit authenticates the request without querying
+    the Token and CustomUser tables. Cached entries expire
+    after TOKEN_AUTH_CACHE_TTL and are dropped right away
+    when the token is deleted or the user changes.
+    """
+
+    def authenticate_credentials(self, key):
+        user = get_cached_token_user(key)
+
+        if user is None:
+            user, token = super().authenticate_credentials(key)
+            cache_token_user(key, user)
+            return user, token
+
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+
+        return user, self.get_model()(key=key, user=user)
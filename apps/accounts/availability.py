@@ -0,0 +1,84 @@
+from django.core.cache import cache
+from django.db.models import Value
+from django.db.models.functions import Lower
+
+from .caching import (
+    TAKEN_BUILD_TIMEOUT,
+    TAKEN_BUILDING_KEY,
+    TAKEN_READY_KEY,
+    TAKEN_SETS,
+    get_taken_sets_client,
+    is_taken_cached,
+    taken_building_key,
+    taken_set_key,
+)
+from .models import CustomUser
+
+
+def is_taken(field, value):
+    """
+    Check whether a username or email is already in use.
+
+    Values missing from the taken sets are free without
+    a query. Otherwise the users table is checked through
+    the lower(field) index, case-insensitively.
+
+    :param field: 'username' or 'email'
+    :param value: The value to check
+    :return: True if a user already uses the value
+    """
+    if is_taken_cached(field, value) is False:
+        return False
+
+    return CustomUser.objects.alias(
+        lowered=Lower(field)
+    ).filter(
+        lowered=Lower(Value(value))
+    ).exists()
+
+
+def rebuild_taken_sets(chunk_size=10000):
+    """
+    Build the taken sets from the users table.
+
+    The sets are filled under temporary keys and swapped in
+    with RENAME, which also drops values freed since the last
+    build. The building key is set before the users table is
+    read, so values committed after that are added to the new
+    sets by remember_taken and survive the swap.
+
+    :param chunk_size: The number of users read per query
+    :return: The number of users added to the sets
+    """
+    client = get_taken_sets_client()
+    if client is None:
+        raise NotImplementedError('The taken sets require the Redis cache')
+
+    building_flag = cache.make_key(TAKEN_BUILDING_KEY)
+    building = {field: taken_building_key(field) for field in TAKEN_SETS}
+    client.delete(*building.values())
+    client.set(building_flag, 1, ex=TAKEN_BUILD_TIMEOUT)
+
+    users = CustomUser.objects.order_by().values_list('username', 'email')
+    count = 0
+    pipe = client.pipeline(transaction=False)
+    for username, email in users.iterator(chunk_size=chunk_size):
+        pipe.sadd(building['username'], username.lower())
+        if email:
+            pipe.sadd(building['email'], email.lower())
+        count += 1
+        if count % chunk_size == 0:
+            pipe.execute()
+    pipe.execute()
+
+    pipe = client.pipeline()
+    for field in TAKEN_SETS:
+        if client.exists(building[field]):
+            pipe.rename(building[field], taken_set_key(field))
+        else:
+            pipe.delete(taken_set_key(field))
+    pipe.set(cache.make_key(TAKEN_READY_KEY), 1)
+    pipe.delete(building_flag)
+    pipe.execute()
+
+    return count
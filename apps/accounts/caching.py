@@ -0,0 +1,167 @@
+import copy
+import hashlib
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+# Redis sets with the lowercased usernames and emails in use. They
+# may hold values that were freed since, but once built (the ready
+# key is set) every value in use is in them.
+TAKEN_SETS = {
+    'username': 'taken_usernames',
+    'email': 'taken_emails'
+}
+TAKEN_READY_KEY = 'taken_ready'
+# Set while the sets are rebuilt, values taken meanwhile go to both
+# the live and the new sets. Expires if a rebuild dies halfway.
+TAKEN_BUILDING_KEY = 'taken_building'
+TAKEN_BUILD_TIMEOUT = 60 * 60
+
+
+def _token_key(token_key):
+    # The token itself is a credential, only its digest goes into the key
+    return 'auth_token_' + hashlib.sha256(token_key.encode()).hexdigest()
+
+
+def _user_key(user_id):
+    return f'auth_user_{user_id}'
+
+
+def get_cached_token_user(token_key):
+    """
+    Return the cached user authenticated by a token.
+
+    :param token_key: The key of the token
+    :return: The CustomUser instance, or None on a cache miss
+    """
+    user_id = cache.get(_token_key(token_key))
+    if user_id is None:
+        return None
+    return cache.get(_user_key(user_id))
+
+
+def cache_token_user(token_key, user):
+    """
+    Cache the user authenticated by a token.
+
+    The token only maps to the user id and the user is
+    cached on its own, so changes of the user invalidate
+    every token of the user at once.
+
+    :param token_key: The key of the token
+    :param user: The CustomUser owning the token
+    """
+    # Related objects loaded with the user (e.g. its Token through
+    # select_related, with the raw key) must not end up in the cache
+    cached_user = copy.copy(user)
+    cached_user._state.fields_cache = {}
+    cache.set_many(
+        {
+            _token_key(token_key): user.pk,
+            _user_key(user.pk): cached_user
+        },
+        timeout=settings.TOKEN_AUTH_CACHE_TTL
+    )
+
+
+def invalidate_cached_token(token_key):
+    """
+    Drop a cached token, e.g. when it is deleted.
+
+    :param token_key: The key of the token
+    """
+    cache.delete(_token_key(token_key))
+
+
+def invalidate_cached_user(*user_ids):
+    """
+    Drop the cached copies of users after they have changed.
+
+    :param user_ids: The ids of the users
+    """
+    cache.delete_many([_user_key(user_id) for user_id in user_ids])
+
+
+def get_taken_sets_client():
+    """
+    Return the Redis client holding the taken sets,
+    or None when the cache is not Redis.
+    """
+    try:
+        return get_redis_connection('default')
+    except NotImplementedError:
+        return None
+
+
+def taken_set_key(field):
+    return cache.make_key(TAKEN_SETS[field])
+
+
+def taken_building_key(field):
+    return taken_set_key(field) + ':building'
+
+
+def is_taken_cached(field, value):
+    """
+    Check a username or email against the taken sets.
+
+    :param field: 'username' or 'email'
+    :param value: The value to check
+    :return: False if the value is surely free, True if it
+    may be taken, None if the sets cannot tell (not built
+    yet or Redis unavailable)
+    """
+    client = get_taken_sets_client()
+    if client is None:
+        return None
+
+    try:
+        pipe = client.pipeline(transaction=False)
+        pipe.exists(cache.make_key(TAKEN_READY_KEY))
+        pipe.exists(taken_set_key(field))
+        pipe.sismember(taken_set_key(field), value.lower())
+        ready, built, member = pipe.execute()
+    except RedisError as e:
+        logger.warning(f"Taken {field} check skipped: {e}")
+        return None
+
+    # The cache may evict the set and keep the ready key
+    if not ready or not built:
+        return None
+    return bool(member)
+
+
+def remember_taken(username, email):
+    """
+    Add a username and email to the taken sets.
+
+    During a rebuild they are added to the sets being built
+    as well, the build may have read the users table before
+    they were committed.
+
+    :param username: The username in use
+    :param email: The email in use
+    """
+    client = get_taken_sets_client()
+    if client is None:
+        return
+
+    try:
+        values = {'username': username, 'email': email}
+        keys = [taken_set_key]
+        if client.exists(cache.make_key(TAKEN_BUILDING_KEY)):
+            keys.append(taken_building_key)
+
+        pipe = client.pipeline(transaction=False)
+        for key in keys:
+            for field, value in values.items():
+                if value:
+                    pipe.sadd(key(field), value.lower())
+        pipe.execute()
+    except RedisError as e:
+        logger.warning(f"Taken sets not updated for {username}: {e}")
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.accounts.availability import rebuild_taken_sets
+
+
+class Command(BaseCommand):
+    help = "Rebuild the Redis sets of taken usernames and emails"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=10000,
+            help='Number of users read per query'
+        )
+
+    def handle(self, *args, **options):
+        """
+        Fill the sets used by the username and email
+        availability checks from the users table.
+
+        Until the sets are built the checks query
+        the database for every value.
+        """
+        try:
+            count = rebuild_taken_sets(options['chunk_size'])
+        except NotImplementedError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Taken sets rebuilt from {count} users')
+        )
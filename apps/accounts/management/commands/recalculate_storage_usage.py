@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db.models import BigIntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from apps.accounts.models import CustomUser
+from apps.storage.models import UserFile
+
+
+class Command(BaseCommand):
+    help = "Rebuild every user's storage_used counter from their files"
+
+    def handle(self, *args, **options):
+        """
+        Recalculate the storage usage of all users.
+
+        The counters are rebuilt by a single UPDATE with
+        a correlated SUM over each user's files.
+        """
+        usage = UserFile.objects.filter(
+            user=OuterRef('pk')
+        ).order_by().values('user').annotate(
+            total=Sum('size')
+        ).values('total')
+
+        updated = CustomUser.objects.update(
+            storage_used=Coalesce(
+                Subquery(usage),
+                0,
+                output_field=BigIntegerField()
+            )
+        )
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Storage usage recalculated for {updated} users')
+        )
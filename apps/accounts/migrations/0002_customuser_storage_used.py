@@ -0,0 +1,42 @@
+# Generated by Django 4.2 on 2026-10-17 00:41
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def fill_storage_used(apps, schema_editor):
+    CustomUser = apps.get_model('accounts', 'CustomUser')
+    UserFile = apps.get_model('storage', 'UserFile')
+    usage = UserFile.objects.filter(
+        user=OuterRef('pk')
+    ).order_by().values('user').annotate(
+        total=Sum('size')
+    ).values('total')
+    CustomUser.objects.update(
+        storage_used=Coalesce(
+            Subquery(usage),
+            0,
+            output_field=models.BigIntegerField()
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('storage', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='storage_used',
+            field=models.BigIntegerField(default=0, editable=False, help_text="Total size of the user's files in bytes"),
+        ),
+        migrations.RunPython(
+            fill_storage_used,
+            migrations.RunPython.noop
+        ),
+    ]
@@ -1,8 +1,12 @@
 from django.conf import settings
 from django.contrib.auth.models import AbstractUser
-from django.core.cache import cache
 from django.core.validators import MinValueValidator, RegexValidator
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest, Lower
+from django.utils import timezone
+
+from .caching import invalidate_cached_user, remember_taken
 
 
 class CustomUser(AbstractUser):
@@ -33,27 +37,68 @@ class CustomUser(AbstractUser):
         validators=[MinValueValidator(settings.MIN_USER_BYTES)],
         help_text="Maximum storage capacity in bytes"
     )
+    storage_used = models.BigIntegerField(
+        default=0,
+        editable=False,
+        help_text="Total size of the user's files in bytes"
+    )
 
     def get_storage_usage(self):
         """
-        Calculate the total storage usage for the user with caching
-        """
-        cache_key = f'user_{self.id}_storage_usage'
-        usage = cache.get(cache_key)
-        
-        if usage is None:
-            from apps.storage.models import UserFile
-            try:
-                usage = sum(
-                    file.size for file in
-                    UserFile.objects.filter(user=self).only('size')
-                )
-                # Кешируем на 5 минут
-                cache.set(cache_key, usage, timeout=300)
-            except Exception:
-                usage = 0
-                
-        return usage
+        Return the total storage usage for the user.
+
+        The usage is kept in the storage_used counter,
+        which is updated together with the user's files.
+        """
+        return self.storage_used
+
+    def add_storage_usage(self, delta):
+        """
+        Atomically adjust the storage usage counter.
+
+        The counter is updated with an F() expression, so
+        concurrent changes are never lost, and the value on
+        this instance is adjusted to match.
+
+        :param delta: The number of bytes to add (negative to release).
+        """
+        CustomUser.objects.filter(pk=self.pk).update(
+            storage_used=Greatest(F('storage_used') + delta, 0)
+        )
+        self.storage_used = max(self.storage_used + delta, 0)
+        self.invalidate_cache()
+
+    def reserve_storage(self, size):
+        """
+        Charge bytes to the storage usage if they fit in the quota.
+
+        The check and the charge are a single conditional UPDATE,
+        so the user's row is only locked for that statement and
+        not while the upload is being stored. A reservation that
+        is not turned into a file has to be released with
+        add_storage_usage(-size).
+
+        :param size: The number of bytes to reserve.
+        :return: True if the bytes have been reserved, False
+        if they do not fit in the quota.
+        """
+        reserved = CustomUser.objects.filter(
+            pk=self.pk,
+            storage_used__lte=F('max_storage') - size
+        ).update(storage_used=F('storage_used') + size)
+        if reserved:
+            self.storage_used += size
+            self.invalidate_cache()
+        return bool(reserved)
+
+    def invalidate_cache(self):
+        """
+        Drop the cached copy of the user (see CachedTokenAuthentication)
+        now and once the current transaction commits.
+        """
+        user_id = self.pk
+        invalidate_cached_user(user_id)
+        transaction.on_commit(lambda: invalidate_cached_user(user_id))
 
     def save(self, *args, **kwargs):
         if not self.pk:
@@ -65,13 +110,21 @@ class CustomUser(AbstractUser):
                 self.is_staff = True
                 self.is_superuser = True
                 self.max_storage = settings.MAX_ADMIN_BYTES
+        elif not self._state.adding and kwargs.get('update_fields') is None:
+            # storage_used is only changed through add_storage_usage(),
+            # a stale instance must not overwrite it
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'storage_used'
+            ]
         super().save(*args, **kwargs)
         if not self.storage_path:
             self.storage_path = f'user_{self.id}_storage'
             super().save(update_fields=['storage_path'])
-        
-        # Инвалидируем кеш использования хранилища
-        cache.delete(f'user_{self.id}_storage_usage')
+        self.invalidate_cache()
+
+        username, email = self.username, self.email
+        transaction.on_commit(lambda: remember_taken(username, email))
 
     def get_storage_usage_percent(self):
         """
@@ -88,19 +141,75 @@ class CustomUser(AbstractUser):
             return 0
         return (self.get_storage_usage() / self.max_storage) * 100
 
-    def has_storage_space(self, additional_bytes=0):
+    def has_storage_space(self, additional_bytes=0, for_update=False):
         """
         Check if the user has enough storage
         space to add additional bytes.
 
+        With for_update the user's row is locked and the
+        counter re-read, so the check and the following
+        upload are serialized with other uploads of the
+        user. It must then be called inside transaction.atomic().
+
         :param additional_bytes: The number
         of bytes to add to the user's storage.
+        :param for_update: Lock the row and re-read the usage.
         :return: True if the user has
         enough space, False otherwise.
         """
+        if for_update:
+            self.storage_used, self.max_storage = (
+                CustomUser.objects.select_for_update()
+                .values_list('storage_used', 'max_storage')
+                .get(pk=self.pk)
+            )
         new_storage_value = self.get_storage_usage() + additional_bytes
         return new_storage_value <= self.max_storage
 
+    def schedule_deletion(self):
+        """
+        Delete the user without waiting for their files.
+
+        The user is deactivated and their files are moved
+        to the trash with a single UPDATE; once committed,
+        the cached file list and shared links of the user
+        are invalidated and purge_user_task removes the
+        files in batches and deletes the user row at the end.
+        """
+        from rest_framework.authtoken.models import Token
+
+        from apps.storage.caching import (
+            bump_file_list_generation,
+            invalidate_shared_link,
+        )
+        from apps.storage.models import UserFile
+        from apps.storage.tasks import purge_user_task
+
+        from .caching import invalidate_cached_token
+
+        self.is_active = False
+        self.save(update_fields=['is_active'])
+        for token in Token.objects.filter(user=self):
+            invalidate_cached_token(token.key)
+            token.delete()
+        files = UserFile.objects.filter(user=self)
+        shared_links = list(
+            files.filter(shared_link__isnull=False).values_list(
+                'shared_link',
+                flat=True
+            )
+        )
+        files.update(deleted_at=timezone.now())
+
+        user_id = self.pk
+
+        def cleanup():
+            bump_file_list_generation(user_id)
+            invalidate_shared_link(*shared_links)
+            purge_user_task.delay(user_id)
+
+        transaction.on_commit(cleanup)
+
     def __str__(self):
         """
         Return the string representation of the user.
@@ -114,3 +223,8 @@ class CustomUser(AbstractUser):
     class Meta:
         verbose_name = 'User'
         verbose_name_plural = 'Users'
+        indexes = [
+            # Case-insensitive lookups of the availability checks
+            models.Index(Lower('username'), name='user_username_lower_idx'),
+            models.Index(Lower('email'), name='user_email_lower_idx'),
+        ]
@@ -0,0 +1,13 @@
+from apps.storage.pagination import FileCursorPagination
+
+
+class UserCursorPagination(FileCursorPagination):
+    """
+    Keyset pagination of the admin user list.
+
+    Works like the file list pagination; the storage
+    usage is read from the storage_used counter, so
+    a page costs a single query.
+    """
+    ordering_fields = ('id', 'username', 'date_joined', 'storage_used')
+    default_ordering = 'id'
@@ -80,19 +80,6 @@ class UserSerializer(serializers.ModelSerializer):
                 raise serializers.ValidationError("Passwords don't match")
         return data
 
-    def to_representation(self, instance):
-        """
-        Customize the representation of the user object to include
-        the storage usage and maximum storage limit.
-
-        :param instance: The user object
-        :return: The customized representation of the user object
-        """
-        representation = super().to_representation(instance)
-        representation['storage_usage'] = self.get_storage_usage(instance)
-        representation['max_storage_gb'] = self.get_max_storage_gb(instance)
-        return representation
-
     def create(self, validated_data):
         """
         Create a new user.
@@ -162,6 +149,7 @@ class UserUpdateSerializer(serializers.ModelSerializer):
 class LoginSerializer(serializers.Serializer):
     username = serializers.CharField()
     password = serializers.CharField()
+    session = serializers.BooleanField(default=True)
 
     def validate(self, data):
         """
@@ -0,0 +1,119 @@
+import pickle
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from apps.accounts.models import CustomUser
+
+
+class CachedTokenAuthenticationTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(
+            username='cached',
+            email='cached@example.com',
+            full_name='Cached User',
+            password='testpass123'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_cached_token_needs_no_queries(self):
+        url = reverse('current-user')
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['username'], 'cached')
+
+    def test_cached_user_holds_no_token(self):
+        self.client.get(reverse('current-user'))
+
+        cached_user = cache.get(f'auth_user_{self.user.pk}')
+        self.assertEqual(cached_user.pk, self.user.pk)
+        self.assertNotIn(self.token.key.encode(), pickle.dumps(cached_user))
+
+    def test_storage_usage_change_invalidates_user(self):
+        url = reverse('current-user')
+        self.client.get(url)
+
+        self.user.add_storage_usage(100)
+
+        response = self.client.get(url)
+        self.assertEqual(response.data['storage_usage'], 100)
+
+    def test_logout_invalidates_token(self):
+        self.client.get(reverse('current-user'))
+
+        response = self.client.post(reverse('logout'))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        response = self.client.get(reverse('current-user'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivation_invalidates_user(self):
+        self.client.get(reverse('current-user'))
+
+        admin = CustomUser.objects.create_superuser(
+            username='admin',
+            email='admin@example.com',
+            full_name='Admin User',
+            password='testpass123'
+        )
+        admin_client = self.client_class()
+        admin_client.force_authenticate(user=admin)
+        response = admin_client.delete(
+            reverse('user-detail', kwargs={'pk': self.user.pk})
+        )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        response = self.client.get(reverse('current-user'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class LoginSessionTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(
+            username='session',
+            email='session@example.com',
+            full_name='Session User',
+            password='testpass123'
+        )
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_login_creates_session(self):
+        response = self.client.post(
+            reverse('login'),
+            {'username': 'session', 'password': 'testpass123'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(settings.SESSION_COOKIE_NAME, response.cookies)
+
+    def test_token_only_login_skips_session(self):
+        response = self.client.post(
+            reverse('login'),
+            {'username': 'session', 'password': 'testpass123', 'session': False}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies)
+        self.assertFalse(Session.objects.exists())
+
+        self.user.refresh_from_db()
+        self.assertIsNotNone(self.user.last_login)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {response.data['token']}")
+        response = self.client.post(reverse('logout'))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Token.objects.filter(user=self.user).exists())
@@ -0,0 +1,88 @@
+from unittest.mock import patch
+
+import fakeredis
+from django.core.cache import cache
+from django.db.models.query import QuerySet
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from apps.accounts.availability import rebuild_taken_sets
+from apps.accounts.caching import is_taken_cached, remember_taken, taken_set_key
+from apps.accounts.models import CustomUser
+
+
+class AvailabilityTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(
+            username='Taken',
+            email='Taken@example.com',
+            full_name='Taken User',
+            password='testpass123'
+        )
+
+    def tearDown(self):
+        cache.clear()
+
+    def check(self, name, value):
+        response = self.client.get(reverse(f'check-{name}'), {name: value})
+        return response.json()['available']
+
+    def test_checks_are_case_insensitive(self):
+        self.assertFalse(self.check('username', 'taken'))
+        self.assertFalse(self.check('email', 'taken@EXAMPLE.com'))
+        self.assertTrue(self.check('username', 'free'))
+        self.assertTrue(self.check('email', 'free@example.com'))
+
+    def test_taken_sets_answer_free_values_without_queries(self):
+        client = fakeredis.FakeRedis()
+        with patch(
+            'apps.accounts.caching.get_redis_connection',
+            return_value=client
+        ):
+            self.assertEqual(rebuild_taken_sets(), 1)
+
+            with self.assertNumQueries(0):
+                self.assertTrue(self.check('username', 'free'))
+            self.assertFalse(self.check('username', 'TAKEN'))
+
+            with self.captureOnCommitCallbacks(execute=True):
+                CustomUser.objects.create_user(
+                    username='newcomer',
+                    email='newcomer@example.com',
+                    full_name='New User',
+                    password='testpass123'
+                )
+            self.assertFalse(self.check('username', 'newcomer'))
+            self.assertFalse(self.check('email', 'Newcomer@example.com'))
+
+    def test_values_taken_during_rebuild_survive_the_swap(self):
+        client = fakeredis.FakeRedis()
+        real_iterator = QuerySet.iterator
+
+        def iterator(queryset, *args, **kwargs):
+            yield from real_iterator(queryset, *args, **kwargs)
+            # Committed after the build has read the users table
+            remember_taken('latecomer', 'latecomer@example.com')
+
+        with patch(
+            'apps.accounts.caching.get_redis_connection',
+            return_value=client
+        ):
+            with patch.object(QuerySet, 'iterator', iterator):
+                rebuild_taken_sets()
+
+            self.assertEqual(is_taken_cached('username', 'latecomer'), True)
+            self.assertEqual(is_taken_cached('email', 'Latecomer@example.com'), True)
+
+    def test_evicted_set_falls_back_to_database(self):
+        client = fakeredis.FakeRedis()
+        with patch(
+            'apps.accounts.caching.get_redis_connection',
+            return_value=client
+        ):
+            rebuild_taken_sets()
+            client.delete(taken_set_key('username'))
+
+            self.assertIsNone(is_taken_cached('username', 'taken'))
+            self.assertFalse(self.check('username', 'taken'))
@@ -1,6 +1,9 @@
 # apps\accounts\tests\test_models.py
+from io import StringIO
+
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
 from django.db import connection
 from django.test import TransactionTestCase
 
@@ -47,8 +50,44 @@ class CustomUserModelTest(TransactionTestCase):
         usage = self.user.get_storage_usage()
         self.assertEqual(usage, len(test_content))
 
-        cached_usage = cache.get(f'user_{self.user.id}_storage_usage')
-        self.assertEqual(cached_usage, usage)
+        stored_usage = CustomUser.objects.get(pk=self.user.pk).storage_used
+        self.assertEqual(stored_usage, usage)
+
+        user_file.delete()
+        self.assertEqual(self.user.get_storage_usage(), 0)
+        self.assertEqual(
+            CustomUser.objects.get(pk=self.user.pk).storage_used, 0
+        )
+
+    def test_stale_save_keeps_storage_usage(self):
+        stale_user = CustomUser.objects.get(pk=self.user.pk)
+        UserFile.objects.create(
+            user=self.user,
+            original_name='test_file.txt',
+            file=None,
+            size=1024
+        )
+
+        stale_user.full_name = 'Renamed User'
+        stale_user.save()
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.full_name, 'Renamed User')
+        self.assertEqual(self.user.storage_used, 1024)
+
+    def test_recalculate_storage_usage_command(self):
+        UserFile.objects.create(
+            user=self.user,
+            original_name='test_file.txt',
+            file=None,
+            size=2048
+        )
+        CustomUser.objects.filter(pk=self.user.pk).update(storage_used=1)
+
+        call_command('recalculate_storage_usage', stdout=StringIO())
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.storage_used, 2048)
 
     def test_storage_usage_percent(self):
         test_size = 50 * 1024 * 1024  # 50MB
@@ -75,6 +114,14 @@ class CustomUserModelTest(TransactionTestCase):
         self.assertTrue(self.user.has_storage_space(50 * 1024 * 1024))
         self.assertFalse(self.user.has_storage_space(60 * 1024 * 1024))
 
+    def test_reserve_storage(self):
+        self.assertTrue(self.user.reserve_storage(self.user.max_storage - 10))
+        self.assertFalse(self.user.reserve_storage(11))
+        self.assertTrue(self.user.reserve_storage(10))
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.storage_used, self.user.max_storage)
+
     def test_storage_path_auto_generation(self):
         new_user = CustomUser.objects.create_user(
             username='newuser',
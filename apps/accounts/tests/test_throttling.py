@@ -0,0 +1,50 @@
+from unittest.mock import MagicMock, patch
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase
+
+from apps.accounts.throttling import RedisAnonRateThrottle, RedisThrottleMixin
+
+
+class LimitedThrottle(RedisAnonRateThrottle):
+    rate = '2/min'
+
+
+class RedisThrottleTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        RedisThrottleMixin._script = None
+        self.request = RequestFactory().get('/')
+        self.request.user = AnonymousUser()
+
+    def tearDown(self):
+        RedisThrottleMixin._script = None
+        cache.clear()
+
+    def test_gcra_script_decides(self):
+        script = MagicMock(side_effect=[[1, b'0'], [0, b'2.5']])
+        client = MagicMock()
+        client.register_script.return_value = script
+
+        with patch(
+            'apps.accounts.throttling.get_redis_connection',
+            return_value=client
+        ):
+            throttle = LimitedThrottle()
+            self.assertTrue(throttle.allow_request(self.request, None))
+            self.assertFalse(throttle.allow_request(self.request, None))
+
+        self.assertEqual(throttle.wait(), 2.5)
+        keys = script.call_args.kwargs['keys']
+        args = script.call_args.kwargs['args']
+        self.assertEqual(keys, [cache.make_key(throttle.key)])
+        self.assertEqual(args, [30.0, 60])
+        client.register_script.assert_called_once()
+
+    def test_falls_back_without_redis(self):
+        throttle = LimitedThrottle()
+        self.assertTrue(throttle.allow_request(self.request, None))
+        self.assertTrue(throttle.allow_request(self.request, None))
+        self.assertFalse(throttle.allow_request(self.request, None))
+        self.assertIsNotNone(throttle.wait())
@@ -0,0 +1,66 @@
+import base64
+import json
+
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from apps.accounts.models import CustomUser
+
+
+class UserListTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = CustomUser.objects.create_superuser(
+            username='admin',
+            email='admin@example.com',
+            full_name='Admin User',
+            password='testpass123'
+        )
+        CustomUser.objects.bulk_create([
+            CustomUser(
+                username=f'user{i:03}',
+                email=f'user{i}@example.com',
+                full_name='List User',
+                storage_path=f'list_{i}_storage',
+                storage_used=i * 1024
+            )
+            for i in range(30)
+        ])
+        self.client.force_authenticate(user=self.admin)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_user_list_pages_in_one_query(self):
+        url = reverse('user-list') + '?page_size=10&ordering=-storage_used'
+        seen = []
+
+        while url:
+            with self.assertNumQueries(1):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen.extend(response.data['results'])
+            url = response.data['next']
+
+        self.assertEqual(len(seen), 31)
+        self.assertEqual(seen[0]['username'], 'user029')
+        self.assertEqual(seen[0]['storage_usage'], 29 * 1024)
+
+    def test_user_list_rejects_tampered_cursor(self):
+        cursor = base64.urlsafe_b64encode(json.dumps({
+            'field': 'date_joined',
+            'value': 'garbage',
+            'id': 1
+        }).encode()).decode()
+        response = self.client.get(
+            reverse('user-list'),
+            {'ordering': 'date_joined', 'cursor': cursor}
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_user_list_requires_admin(self):
+        self.client.force_authenticate(user=CustomUser.objects.get(username='user001'))
+        response = self.client.get(reverse('user-list'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
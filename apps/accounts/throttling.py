@@ -1,8 +1,101 @@
-from rest_framework.throttling import UserRateThrottle
+import logging
 
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+from rest_framework.throttling import AnonRateThrottle, UserRateThrottle
 
-class RegisterThrottle(UserRateThrottle):
+logger = logging.getLogger(__name__)
+
+# GCRA (generic cell rate algorithm): the key holds a single number,
+# the theoretical arrival time (TAT) of the next request. Each request
+# moves it forward by period / rate; a request is rejected when that
+# would put the TAT more than one period ahead of now. The server
+# clock is used, so all web workers agree on the time.
+GCRA_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local interval = tonumber(ARGV[1])
+local period = tonumber(ARGV[2])
+
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then
+    tat = now
+end
+
+local new_tat = tat + interval
+local allow_at = new_tat - period
+if allow_at > now then
+    return {0, tostring(allow_at - now)}
+end
+
+redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil((new_tat - now) * 1000))
+return {1, '0'}
+"""
+
+
+class RedisThrottleMixin:
+    """
+    Rate limiting with a GCRA token bucket kept in Redis.
+
+    Unlike SimpleRateThrottle, which stores and rewrites the
+    list of all request timestamps within the period, every
+    key holds one number and each request costs a single
+    atomic script call. Falls back to the history-based
+    throttle when the cache is not Redis, and lets requests
+    through if Redis is unavailable.
+    """
+    _script = None
+    _wait = None
+
+    @classmethod
+    def get_script(cls, client):
+        if RedisThrottleMixin._script is None:
+            RedisThrottleMixin._script = client.register_script(GCRA_SCRIPT)
+        return RedisThrottleMixin._script
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        try:
+            client = get_redis_connection('default')
+        except NotImplementedError:
+            return super().allow_request(request, view)
+
+        try:
+            allowed, wait = self.get_script(client)(
+                keys=[self.cache.make_key(self.key)],
+                args=[self.duration / self.num_requests, self.duration],
+                client=client
+            )
+        except RedisError as e:
+            logger.warning(f"Throttle check skipped: {e}")
+            return True
+
+        self._wait = float(wait)
+        return bool(allowed)
+
+    def wait(self):
+        if self._wait is None:
+            return super().wait()
+        return self._wait
+
+
+class RedisAnonRateThrottle(RedisThrottleMixin, AnonRateThrottle):
+    pass
+
+
+class RedisUserRateThrottle(RedisThrottleMixin, UserRateThrottle):
+    pass
+
+
+class RegisterThrottle(RedisUserRateThrottle):
     scope = 'register'
 
-class LoginThrottle(UserRateThrottle):
+
+class LoginThrottle(RedisUserRateThrottle):
     scope = 'login'
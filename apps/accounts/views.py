@@ -1,5 +1,6 @@
 from django.conf import settings
 from django.contrib.auth import authenticate, login, logout
+from django.contrib.auth.signals import user_logged_in
 from django.db.models import Q
 from django.http import JsonResponse
 from django.middleware.csrf import get_token
@@ -14,7 +15,10 @@ from rest_framework.response import Response
 
 from apps.accounts.throttling import LoginThrottle, RegisterThrottle
 
+from .availability import is_taken
+from .caching import invalidate_cached_token
 from .models import CustomUser
+from .pagination import UserCursorPagination
 from .serializers import (
     AdminCreateSerializer,
     LoginSerializer,
@@ -69,6 +73,9 @@ class LoginView(GenericAPIView):
         """
         Handle a login request.
 
+        Clients using only the token can pass session=false,
+        then no session is created for the login.
+
         :param request: The request object
         :return: A response object with the
         authentication token and user data
@@ -101,7 +108,14 @@ class LoginView(GenericAPIView):
                 status=status.HTTP_403_FORBIDDEN
             )
 
-        login(request, user)
+        if serializer.validated_data['session']:
+            login(request, user)
+        else:
+            user_logged_in.send(
+                sender=user.__class__,
+                request=request,
+                user=user
+            )
         token, _ = Token.objects.get_or_create(user=user)
 
         return Response({
@@ -134,8 +148,11 @@ class LogoutView(generics.GenericAPIView):
         :return: An HTTP 204 No Content response
         indicating successful logout
         """
-        request.user.auth_token.delete()
-        logout(request)
+        token = request.user.auth_token
+        invalidate_cached_token(token.key)
+        token.delete()
+        if request.session.session_key:
+            logout(request)
         return Response(
             status=status.HTTP_204_NO_CONTENT
         )
@@ -145,6 +162,7 @@ class UserListView(generics.ListAPIView):
     queryset = CustomUser.objects.all()
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAdminUser]
+    pagination_class = UserCursorPagination
 
 
 class UserDetailView(generics.RetrieveUpdateDestroyAPIView):
@@ -168,6 +186,15 @@ class UserDetailView(generics.RetrieveUpdateDestroyAPIView):
             return UserUpdateSerializer
         return UserSerializer
 
+    def perform_destroy(self, instance):
+        """
+        Delete a user without waiting for their files,
+        see CustomUser.schedule_deletion.
+
+        :param instance: The user to delete
+        """
+        instance.schedule_deletion()
+
 
 class AdminCreateView(generics.CreateAPIView):
     queryset = CustomUser.objects.all()
@@ -239,11 +266,11 @@ def current_user(request):
 @api_view(['GET'])
 def check_username(request):
     username = request.GET.get('username', '')
-    exists = CustomUser.objects.filter(username__iexact=username).exists()
+    exists = is_taken('username', username)
     return JsonResponse({'available': not exists})
 
 @api_view(['GET'])
 def check_email(request):
     email = request.GET.get('email', '')
-    exists = CustomUser.objects.filter(email__iexact=email).exists()
+    exists = is_taken('email', email)
     return JsonResponse({'available': not exists})
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import UserFile
+from .models import Blob, UserFile, delete_files
 
 
 @admin.register(UserFile)
@@ -9,10 +9,12 @@ class UserFileAdmin(admin.ModelAdmin):
         'original_name',
         'user',
         'size',
-        'upload_date'
+        'upload_date',
+        'deleted_at'
     )
     list_filter = (
         'user',
+        'deleted_at'
     )
     search_fields = (
         'original_name',
@@ -21,5 +23,37 @@ class UserFileAdmin(admin.ModelAdmin):
     readonly_fields = (
         'size',
         'upload_date',
-        'last_download'
+        'last_download',
+        'deleted_at'
+    )
+
+    def get_queryset(self, request):
+        # Files in the trash are listed too
+        return UserFile.all_objects.select_related('user')
+
+    def delete_model(self, request, obj):
+        # Releases the storage usage and the blob like every other delete
+        delete_files([obj.pk])
+
+    def delete_queryset(self, request, queryset):
+        delete_files(list(queryset.values_list('pk', flat=True)))
+
+
+@admin.register(Blob)
+class BlobAdmin(admin.ModelAdmin):
+    list_display = (
+        'sha256',
+        'size',
+        'ref_count',
+        'created_at'
+    )
+    search_fields = (
+        'sha256',
+    )
+    readonly_fields = (
+        'sha256',
+        'file',
+        'size',
+        'ref_count',
+        'created_at'
     )
@@ -10,4 +10,6 @@ class StorageConfig(AppConfig):
     def ready(self):
         # Принудительно импортируем задачи при запуске приложения
         from . import tasks  # noqa
+        # Удаление файлов пользователя перед каскадным удалением
+        from . import signals  # noqa
         super().ready()
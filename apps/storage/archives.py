@@ -0,0 +1,327 @@
+import io
+import json
+import logging
+import os
+import sqlite3
+import tarfile
+import tempfile
+import zipfile
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+
+from .downloads import STREAM_CHUNK_SIZE
+from .models import UserFile
+
+logger = logging.getLogger(__name__)
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+TAR_BLOCK_SIZE = tarfile.BLOCKSIZE
+TAR_COMPRESSIONS = ('zstd',)
+# The manifest is kept in memory up to this size, then on disk
+MANIFEST_SPOOL_SIZE = 1024 * 1024
+
+# Formats that are already compressed gain nothing from deflate
+STORED_EXTENSIONS = frozenset({
+    '.7z', '.avi', '.bz2', '.docx', '.flac', '.gif', '.gz', '.heic',
+    '.jpeg', '.jpg', '.m4a', '.mkv', '.mov', '.mp3', '.mp4', '.ogg',
+    '.pdf', '.png', '.pptx', '.rar', '.webm', '.webp', '.xlsx', '.xz',
+    '.zip', '.zst',
+})
+
+
+class StreamSink(io.RawIOBase):
+    """
+    An unseekable file object collecting written bytes.
+
+    zipfile and tarfile write archives into it, and the
+    bytes are drained after every chunk, so the archive
+    can be streamed without a temporary file.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._buffer = bytearray()
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._buffer += data
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        """
+        Return and forget the bytes written so far.
+        """
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+def unique_archive_name(name, seen):
+    """
+    Return a name not used by another archive member yet.
+
+    Files with the same original name get a " (n)" suffix
+    before the extension: report.pdf, report (1).pdf, ...
+
+    :param name: The original name of the file
+    :param seen: A set of the names used so far, updated in place
+    :return: The name to store the file under
+    """
+    name = name.replace('\\', '_').replace('/', '_') or 'file'
+    base, ext = os.path.splitext(name)
+    candidate, n = name, 1
+    while candidate in seen:
+        candidate = f'{base} ({n}){ext}'
+        n += 1
+    seen.add(candidate)
+    return candidate
+
+
+class SpooledNameSet:
+    """
+    A set of archive member names kept in a temporary SQLite file.
+
+    Used with unique_archive_name for archives of any number of
+    files, so the names seen so far do not have to fit in memory.
+    """
+
+    def __init__(self):
+        self._file = tempfile.NamedTemporaryFile(suffix='.sqlite3')
+        # Streaming responses may be iterated from different threads
+        self._db = sqlite3.connect(self._file.name, check_same_thread=False)
+        self._db.execute('CREATE TABLE names (name TEXT PRIMARY KEY)')
+
+    def __contains__(self, name):
+        return self._db.execute(
+            'SELECT 1 FROM names WHERE name = ?', (name,)
+        ).fetchone() is not None
+
+    def add(self, name):
+        self._db.execute('INSERT OR IGNORE INTO names VALUES (?)', (name,))
+
+    def close(self):
+        self._db.close()
+        self._file.close()
+
+
+def _open_file(user_file):
+    """
+    Open the content of a file for reading.
+
+    :param user_file: The UserFile instance
+    :return: The open binary file, or None if it cannot be
+    read (e.g. it has gone missing on disk)
+    """
+    try:
+        return open(user_file.file.path, 'rb')
+    except (OSError, ValueError) as e:
+        logger.warning(f"File {user_file.pk} left out of the archive: {e}")
+        return None
+
+
+def iter_zip(user_files, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Stream a ZIP archive of files.
+
+    The archive is written on the fly with data descriptors,
+    ZIP64 extensions are used where sizes or offsets need them.
+    Already compressed formats are stored, anything else is
+    deflated. Memory use does not depend on the file sizes.
+    Files missing on disk are left out.
+
+    :param user_files: An iterable of UserFile instances
+    :param chunk_size: The number of bytes read from a file at a time
+    :return: An iterator over the archive bytes
+    """
+    sink = StreamSink()
+    names = set()
+
+    with zipfile.ZipFile(sink, mode='w', allowZip64=True) as archive:
+        for user_file in user_files:
+            src = _open_file(user_file)
+            if src is None:
+                continue
+            name = unique_archive_name(user_file.original_name, names)
+
+            info = zipfile.ZipInfo(
+                name,
+                date_time=timezone.localtime(
+                    user_file.upload_date
+                ).timetuple()[:6]
+            )
+            info.file_size = os.fstat(src.fileno()).st_size
+            if os.path.splitext(name)[1].lower() in STORED_EXTENSIONS:
+                info.compress_type = zipfile.ZIP_STORED
+            else:
+                info.compress_type = zipfile.ZIP_DEFLATED
+
+            with src, archive.open(info, 'w') as dst:
+                while chunk := src.read(chunk_size):
+                    dst.write(chunk)
+                    data = sink.drain()
+                    if data:
+                        yield data
+
+            yield sink.drain()
+
+    yield sink.drain()
+
+
+def _tar_header(name, size, mtime):
+    """
+    Build the tar header of a regular file.
+
+    The PAX format keeps long UTF-8 names and sizes over 8GB.
+    """
+    info = tarfile.TarInfo(name)
+    info.size = size
+    info.mtime = int(mtime)
+    info.mode = 0o644
+    return info.tobuf(
+        format=tarfile.PAX_FORMAT,
+        encoding='utf-8',
+        errors='surrogateescape'
+    )
+
+
+def _tar_padding(size):
+    return bytes(-size % TAR_BLOCK_SIZE)
+
+
+def _iter_tar_blocks(user_files, chunk_size):
+    """
+    Yield an uncompressed tar archive of files and a manifest.
+
+    Headers and padding are written by hand instead of through
+    tarfile.addfile, which would copy a whole file at once. The
+    member names and manifest entries are spooled to temporary
+    files, so memory use does not grow with the number of files.
+    Files missing on disk are left out and listed in the manifest
+    with "missing": true.
+    """
+    names = SpooledNameSet()
+    manifest = tempfile.SpooledTemporaryFile(
+        max_size=MANIFEST_SPOOL_SIZE,
+        mode='w+b'
+    )
+
+    try:
+        manifest.write(b'[')
+        for i, user_file in enumerate(user_files):
+            entry = {
+                'id': user_file.pk,
+                'original_name': user_file.original_name,
+                'upload_date': user_file.upload_date.isoformat(),
+                'comment': user_file.comment,
+            }
+
+            src = _open_file(user_file)
+            if src is None:
+                entry.update(path=None, size=user_file.size, missing=True)
+            else:
+                with src:
+                    size = os.fstat(src.fileno()).st_size
+                    name = 'files/' + unique_archive_name(
+                        user_file.original_name,
+                        names
+                    )
+                    entry.update(path=name, size=size)
+
+                    yield _tar_header(name, size, user_file.upload_date.timestamp())
+
+                    remaining = size
+                    while remaining:
+                        chunk = src.read(min(chunk_size, remaining))
+                        if not chunk:
+                            break
+                        remaining -= len(chunk)
+                        yield chunk
+                if remaining:
+                    # The file shrank after stat(), keep the member size right
+                    yield bytes(remaining)
+                yield _tar_padding(size)
+
+            manifest.write(b',\n' if i else b'\n')
+            manifest.write(json.dumps(entry, ensure_ascii=False).encode())
+        manifest.write(b'\n]\n')
+
+        size = manifest.tell()
+        manifest.seek(0)
+        yield _tar_header('manifest.json', size, timezone.now().timestamp())
+        while chunk := manifest.read(chunk_size):
+            yield chunk
+        yield _tar_padding(size)
+    finally:
+        manifest.close()
+        names.close()
+
+    # End of archive: two empty blocks
+    yield bytes(TAR_BLOCK_SIZE * 2)
+
+
+def _compress_zstd(blocks):
+    compressor = zstandard.ZstdCompressor().compressobj()
+    for block in blocks:
+        data = compressor.compress(block)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def iter_tar(user_files, compression=None, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Stream a tar archive of files.
+
+    Files are stored under files/<original name> and followed
+    by manifest.json describing every member. Memory use does
+    not depend on the number or size of the files.
+
+    :param user_files: An iterable of UserFile instances,
+    ideally a queryset iterator
+    :param compression: None, or 'zstd' to compress the archive
+    :param chunk_size: The number of bytes read from a file at a time
+    :return: An iterator over the archive bytes
+    :raises ImproperlyConfigured: If zstd is requested but the
+    zstandard package is not installed
+    """
+    if compression not in (None,) + TAR_COMPRESSIONS:
+        raise ValueError(f'Unknown compression: {compression!r}')
+    if compression == 'zstd' and zstandard is None:
+        raise ImproperlyConfigured(
+            'zstd compression requires the zstandard package'
+        )
+
+    blocks = _iter_tar_blocks(user_files, chunk_size)
+    if compression == 'zstd':
+        return _compress_zstd(blocks)
+    return blocks
+
+
+def user_export_files(user):
+    """
+    Return the files of a user for an export, read in chunks.
+
+    :param user: The user whose files are exported
+    :return: An iterator over the user's UserFile instances
+    """
+    return UserFile.objects.filter(user=user).only(
+        'id',
+        'file',
+        'original_name',
+        'size',
+        'upload_date',
+        'comment'
+    ).order_by('id').iterator(chunk_size=settings.EXPORT_ITERATOR_CHUNK_SIZE)
@@ -0,0 +1,237 @@
+import hashlib
+import hmac
+import os
+import secrets
+import uuid
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from .models import Blob
+
+# Uploads are copied here before they are moved into the blob store
+BLOB_STAGING_DIR = os.path.join('blobs', 'staging')
+
+
+def hash_file(file_obj):
+    """
+    Calculate the SHA-256 digest of a file by reading it in chunks.
+
+    :param file_obj: A Django File object
+    :return: The hex digest of the file content
+    """
+    hasher = hashlib.sha256()
+    for chunk in file_obj.chunks():
+        hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def hash_path(path, chunk_size=1048576):
+    """
+    Calculate the SHA-256 digest of a file on disk.
+
+    :param path: The absolute path of the file
+    :param chunk_size: The number of bytes read at a time
+    :return: The hex digest of the file content
+    """
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def stage_file(file_obj, sha256=None):
+    """
+    Copy an uploaded file into the staging directory of the blob store.
+
+    The content is hashed while it is copied, unless the digest
+    is already known. The staged file is only moved into place
+    once the blob referencing it has been committed.
+
+    :param file_obj: A Django File object with the content
+    :param sha256: The digest computed while the file was
+    uploaded, or None to compute it here
+    :return: A tuple of the absolute path of the staged
+    file and the hex digest of its content
+    """
+    storage = Blob._meta.get_field('file').storage
+    path = storage.path(os.path.join(BLOB_STAGING_DIR, uuid.uuid4().hex))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    hasher = hashlib.sha256() if sha256 is None else None
+    with open(path, 'wb') as destination:
+        for chunk in file_obj.chunks():
+            if hasher:
+                hasher.update(chunk)
+            destination.write(chunk)
+
+    return path, sha256 or hasher.hexdigest()
+
+
+def _move_into_store(source, destination):
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    os.replace(source, destination)
+
+
+def discard_file(path):
+    """
+    Remove a staged or uploaded file that is not needed anymore.
+
+    :param path: The absolute path of the file
+    """
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def _acquire_blob(sha256, size, source):
+    """
+    Return the blob for the given digest with one more reference.
+
+    The blob row is locked while it is looked up, so concurrent
+    uploads of the same content store it only once. Nothing on
+    disk changes before the transaction commits: the source file
+    is then moved into the blob store if the content is new (or
+    its file has gone missing), and removed otherwise. If the
+    transaction is rolled back, the source file is left untouched.
+
+    :param sha256: The hex digest of the content
+    :param size: The size of the content in bytes
+    :param source: The absolute path of a file with the content
+    :return: The Blob instance
+    """
+    with transaction.atomic():
+        blob, created = Blob.objects.select_for_update().get_or_create(
+            sha256=sha256,
+            defaults={'size': size}
+        )
+        storage = blob.file.storage
+        if created or not blob.file or not storage.exists(blob.file.name):
+            blob.file.name = blob.file.field.generate_filename(blob, sha256)
+            blob.save(update_fields=['file'])
+            destination = storage.path(blob.file.name)
+            transaction.on_commit(
+                lambda: _move_into_store(source, destination),
+                robust=True
+            )
+        else:
+            transaction.on_commit(
+                lambda: discard_file(source),
+                robust=True
+            )
+
+        _add_reference(blob)
+
+    return blob
+
+
+def _add_reference(blob):
+    """
+    Increment the reference count of a blob.
+
+    :param blob: The Blob instance
+    """
+    Blob.objects.filter(pk=blob.pk).update(
+        ref_count=F('ref_count') + 1
+    )
+    blob.ref_count += 1
+
+
+def store_blob_from_path(path, size, sha256=None):
+    """
+    Turn a file already on disk into a blob and take a reference to it.
+
+    Once the transaction commits, the file is moved into the blob
+    store when its content is new, and removed when an identical
+    blob already exists. On rollback it stays where it is.
+
+    :param path: The absolute path of the file
+    :param size: The size of the file in bytes
+    :param sha256: The digest of the file, or None to compute it here
+    :return: The Blob instance
+    """
+    if sha256 is None:
+        sha256 = hash_path(path)
+    return _acquire_blob(sha256, size, path)
+
+
+def create_possession_challenge(size):
+    """
+    Choose a random byte range of content of the given size.
+
+    A client asking to reference stored content has to send
+    the SHA-256 digest of this range, which it can only
+    compute if it holds the content itself.
+
+    :param size: The size of the content in bytes
+    :return: A tuple of the offset and the length of the range
+    """
+    length = min(size, settings.INSTANT_UPLOAD_PROOF_LENGTH)
+    offset = secrets.randbelow(size - length + 1)
+    return offset, length
+
+
+def reference_blob(sha256, size, offset, length, proof):
+    """
+    Take a reference to already stored content, if there is any
+    and the caller has proven to hold it.
+
+    :param sha256: The hex digest of the content
+    :param size: The size of the content in bytes
+    :param offset: The offset of the challenge range
+    :param length: The length of the challenge range
+    :param proof: The hex digest of the challenge range
+    sent by the caller
+    :return: The Blob instance, or None if no matching
+    content is stored or the proof is wrong
+    """
+    with transaction.atomic():
+        blob = Blob.objects.select_for_update().filter(
+            sha256=sha256,
+            size=size
+        ).first()
+        if blob is None or not blob.file:
+            return None
+
+        try:
+            with blob.file.storage.open(blob.file.name, 'rb') as f:
+                f.seek(offset)
+                data = f.read(length)
+        except OSError:
+            return None
+        expected = hashlib.sha256(data).hexdigest()
+        if len(data) != length or not hmac.compare_digest(expected, proof):
+            return None
+
+        _add_reference(blob)
+
+    return blob
+
+
+def release_blob(blob_id, count=1):
+    """
+    Drop references to a blob.
+
+    The blob row and its content are deleted together
+    with the last reference; the file is removed only
+    once the transaction has been committed.
+
+    :param blob_id: The primary key of the blob
+    :param count: The number of references to drop
+    """
+    with transaction.atomic():
+        blob = Blob.objects.select_for_update().filter(pk=blob_id).first()
+        if blob is None:
+            return
+
+        if blob.ref_count > count:
+            Blob.objects.filter(pk=blob.pk).update(
+                ref_count=F('ref_count') - count
+            )
+            return
+
+        storage, name = blob.file.storage, blob.file.name
+        blob.delete()
+        if name:
+            transaction.on_commit(lambda: storage.delete(name))
@@ -0,0 +1,85 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+def _generation_key(user_id):
+    return f'user_files_generation_{user_id}'
+
+
+def file_list_generation(user_id):
+    """
+    Return the current generation of a user's file list.
+
+    Cached file-list payloads are keyed by this number, so
+    bumping it makes all of them unreachable at once. A missing
+    generation starts from the current time in milliseconds, so
+    it never repeats a value used before the key was evicted.
+
+    :param user_id: The id of the user owning the files
+    :return: The generation number
+    """
+    key = _generation_key(user_id)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        generation = cache.get(key)
+    return generation
+
+
+def bump_file_list_generation(user_id):
+    """
+    Invalidate every cached file-list payload of a user.
+
+    :param user_id: The id of the user owning the files
+    """
+    try:
+        cache.incr(_generation_key(user_id))
+    except ValueError:
+        file_list_generation(user_id)
+
+
+def _shared_link_key(shared_link):
+    return f'shared_link_{shared_link}'
+
+
+def get_cached_shared_link(shared_link):
+    """
+    Return the cached resolution of a shared link.
+
+    :param shared_link: The shared link UUID
+    :return: A dict describing the shared file, an empty dict
+    if the link is known not to exist, or None on a cache miss
+    """
+    return cache.get(_shared_link_key(shared_link))
+
+
+def cache_shared_link(shared_link, data):
+    """
+    Cache the resolution of a shared link.
+
+    Unknown links (empty data) are cached for a shorter
+    time, so scanning for links stays cheap without keeping
+    misses around for long.
+
+    :param shared_link: The shared link UUID
+    :param data: A dict describing the shared file, or an
+    empty dict if no file is shared under this link
+    """
+    timeout = (
+        settings.SHARED_LINK_CACHE_TTL if data
+        else settings.SHARED_LINK_NEGATIVE_CACHE_TTL
+    )
+    cache.set(_shared_link_key(shared_link), data, timeout=timeout)
+
+
+def invalidate_shared_link(*shared_links):
+    """
+    Drop the cached resolution of one or more shared links.
+
+    :param shared_links: The shared link UUIDs
+    """
+    keys = [_shared_link_key(link) for link in shared_links if link]
+    if keys:
+        cache.delete_many(keys)
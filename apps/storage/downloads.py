@@ -0,0 +1,347 @@
+import logging
+import os
+import re
+import uuid
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import (
+    content_disposition_header,
+    http_date,
+    parse_http_date_safe,
+)
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+from .caching import (
+    bump_file_list_generation,
+    cache_shared_link,
+    get_cached_shared_link,
+)
+from .models import UserFile
+
+logger = logging.getLogger(__name__)
+
+RANGE_RE = re.compile(r'^\s*(\d*)\s*-\s*(\d*)\s*$')
+MAX_RANGES = 16
+STREAM_CHUNK_SIZE = 65536
+DOWNLOAD_EVENTS_KEY = 'download_events'
+
+
+def record_download(user_file, when=None):
+    """
+    Remember that a file has been downloaded.
+
+    The timestamp is put into a Redis hash (one field per file,
+    the latest download wins) and written to UserFile.last_download
+    in bulk by flush_download_events_task, so downloads do not
+    write to the database. When buffering is disabled
+    (DOWNLOAD_EVENTS_FLUSH_INTERVAL = 0) or the cache is not
+    Redis, only the last_download column is updated right away.
+
+    :param user_file: The downloaded UserFile
+    :param when: The time of the download, now by default
+    """
+    when = when or timezone.now()
+
+    if settings.DOWNLOAD_EVENTS_FLUSH_INTERVAL:
+        try:
+            get_redis_connection('default').hset(
+                cache.make_key(DOWNLOAD_EVENTS_KEY),
+                user_file.pk,
+                when.timestamp()
+            )
+            return
+        except NotImplementedError:
+            pass
+        except RedisError as e:
+            logger.warning(f"Download event not buffered: {e}")
+
+    UserFile.objects.filter(pk=user_file.pk).update(last_download=when)
+    bump_file_list_generation(user_file.user_id)
+
+
+def parse_range_header(header, size):
+    """
+    Parse a Range header into a list of byte ranges.
+
+    :param header: The value of the Range header
+    :param size: The size of the file in bytes
+    :return: A list of inclusive (start, end) tuples, an empty
+    list if no range can be satisfied, or None if the header
+    is malformed and should be ignored
+    """
+    unit, _, ranges_spec = header.partition('=')
+    if unit.strip().lower() != 'bytes' or not ranges_spec:
+        return None
+
+    specs = ranges_spec.split(',')
+    if len(specs) > MAX_RANGES:
+        return None
+
+    ranges = []
+    for spec in specs:
+        match = RANGE_RE.match(spec)
+        if not match or match.groups() == ('', ''):
+            return None
+        first, last = match.groups()
+
+        if not first:
+            # Suffix range: the last N bytes
+            length = int(last)
+            if length == 0:
+                continue
+            start, end = max(size - length, 0), size - 1
+        else:
+            start = int(first)
+            end = int(last) if last else size - 1
+            if end < start:
+                return None
+            end = min(end, size - 1)
+
+        if start < size:
+            ranges.append((start, end))
+
+    return ranges
+
+
+def resolve_shared_link(shared_link):
+    """
+    Find the file shared under a link, using the cache when possible.
+
+    Cache hits, including links known not to exist, need no
+    database query. The returned UserFile is built from the
+    cached fields only and must not be saved.
+
+    :param shared_link: The shared link UUID
+    :return: A UserFile instance, or None if no file is shared
+    under this link
+    """
+    data = get_cached_shared_link(shared_link)
+
+    if data is None:
+        user_file = UserFile.objects.filter(
+            shared_link=shared_link
+        ).only(
+            'id',
+            'user',
+            'file',
+            'original_name',
+            'size',
+            'shared_expiry'
+        ).first()
+
+        data = {}
+        if user_file is not None:
+            data = {
+                'id': user_file.pk,
+                'user_id': user_file.user_id,
+                'name': user_file.file.name,
+                'original_name': user_file.original_name,
+                'size': user_file.size,
+                'shared_expiry': user_file.shared_expiry,
+            }
+        cache_shared_link(shared_link, data)
+
+    if not data:
+        return None
+
+    user_file = UserFile(
+        id=data['id'],
+        user_id=data['user_id'],
+        original_name=data['original_name'],
+        size=data['size'],
+        shared_link=shared_link,
+        shared_expiry=data['shared_expiry']
+    )
+    user_file.file.name = data['name']
+    user_file._state.adding = False
+    return user_file
+
+
+def iter_file_range(path, start, length, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Yield a part of a file in chunks.
+
+    :param path: The absolute path of the file
+    :param start: The offset of the first byte
+    :param length: The number of bytes to yield
+    :param chunk_size: The maximum size of each chunk
+    """
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(chunk_size, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def _if_range_matches(request, etag, last_modified):
+    """
+    Check whether a Range request may be served partially.
+
+    A Range is only honored when If-Range, if present, still
+    matches the current ETag or Last-Modified date.
+    """
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def _multipart_byteranges(path, ranges, size, content_type):
+    """
+    Build the body of a multipart/byteranges response.
+
+    :return: A tuple of the boundary, the content length
+    and an iterator over the body
+    """
+    boundary = uuid.uuid4().hex
+    headers = [
+        (
+            f'\r\n--{boundary}\r\n'
+            f'Content-Type: {content_type}\r\n'
+            f'Content-Range: bytes {start}-{end}/{size}\r\n\r\n'
+        ).encode()
+        for start, end in ranges
+    ]
+    closing = f'\r\n--{boundary}--\r\n'.encode()
+    length = sum(
+        len(header) + end - start + 1
+        for header, (start, end) in zip(headers, ranges)
+    ) + len(closing)
+
+    def body():
+        for header, (start, end) in zip(headers, ranges):
+            yield header
+            yield from iter_file_range(path, start, end - start + 1)
+        yield closing
+
+    return boundary, length, body()
+
+
+def offload_file(user_file, path, content_type):
+    """
+    Return an empty response asking the front proxy to send the file.
+
+    The proxy streams the file itself (with sendfile) and handles
+    Range requests, so no worker is busy while the file is sent.
+
+    :param user_file: The UserFile to send
+    :param path: The absolute path of the file
+    :param content_type: The content type of the file
+    :return: An HTTP response carrying the internal redirect header
+    """
+    backend = settings.FILE_DELIVERY_BACKEND
+    response = HttpResponse(content_type=content_type)
+
+    if backend == 'x-accel-redirect':
+        prefix = settings.FILE_DELIVERY_ACCEL_PREFIX.rstrip('/')
+        response['X-Accel-Redirect'] = quote(
+            f'{prefix}/{user_file.file.name}'
+        )
+    elif backend == 'x-sendfile':
+        response['X-Sendfile'] = path
+    else:
+        raise ImproperlyConfigured(
+            f'Unknown FILE_DELIVERY_BACKEND: {backend!r}'
+        )
+
+    return response
+
+
+def serve_file(request, user_file, content_type='application/octet-stream'):
+    """
+    Return a download response for a UserFile.
+
+    Supports conditional requests (ETag, Last-Modified,
+    If-None-Match, If-Modified-Since) and byte ranges
+    (single ranges as 206, several ranges as
+    multipart/byteranges, guarded by If-Range).
+
+    Unless FILE_DELIVERY_BACKEND is 'direct', the file
+    body is left to the front proxy, see offload_file.
+
+    :param request: The request object
+    :param user_file: The UserFile to send
+    :param content_type: The content type of the file
+    :return: An HTTP response
+    """
+    path = user_file.file.path
+    stat = os.stat(path)
+    size = stat.st_size
+    last_modified = int(stat.st_mtime)
+    etag = f'"{last_modified:x}-{size:x}"'
+
+    headers = {
+        'Accept-Ranges': 'bytes',
+        'ETag': etag,
+        'Last-Modified': http_date(last_modified),
+        'Content-Disposition': content_disposition_header(
+            True,
+            user_file.original_name
+        ),
+    }
+
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=last_modified
+    )
+    if response is not None:
+        for header, value in headers.items():
+            response.headers.setdefault(header, value)
+        return response
+
+    if settings.FILE_DELIVERY_BACKEND != 'direct':
+        response = offload_file(user_file, path, content_type)
+        response['Content-Disposition'] = headers['Content-Disposition']
+        return response
+
+    range_header = request.META.get('HTTP_RANGE')
+    ranges = None
+    if range_header and _if_range_matches(request, etag, last_modified):
+        ranges = parse_range_header(range_header, size)
+
+    if ranges == []:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    if ranges and len(ranges) == 1:
+        start, end = ranges[0]
+        response = StreamingHttpResponse(
+            iter_file_range(path, start, end - start + 1),
+            status=206,
+            content_type=content_type
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = end - start + 1
+    elif ranges:
+        boundary, length, body = _multipart_byteranges(
+            path, ranges, size, content_type
+        )
+        response = StreamingHttpResponse(
+            body,
+            status=206,
+            content_type=f'multipart/byteranges; boundary={boundary}'
+        )
+        response['Content-Length'] = length
+    else:
+        response = FileResponse(
+            open(path, 'rb'),
+            content_type=content_type
+        )
+
+    for header, value in headers.items():
+        response[header] = value
+    return response
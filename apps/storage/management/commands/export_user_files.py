@@ -0,0 +1,64 @@
+import sys
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.accounts.models import CustomUser
+from apps.storage.archives import TAR_COMPRESSIONS, iter_tar, user_export_files
+
+
+class Command(BaseCommand):
+    help = "Export all files of a user as a tar archive with a JSON manifest"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'user',
+            help='Id or username of the user'
+        )
+        parser.add_argument(
+            '-o', '--output',
+            help='Path of the archive (written to stdout by default)'
+        )
+        parser.add_argument(
+            '--compression',
+            choices=TAR_COMPRESSIONS,
+            help='Compress the archive'
+        )
+
+    def handle(self, *args, **options):
+        """
+        Write the archive of a user's files.
+
+        The files are read from the database in chunks and
+        copied into the archive one at a time, so memory use
+        does not grow with the number of files.
+        """
+        user = self.get_user(options['user'])
+
+        try:
+            chunks = iter_tar(user_export_files(user), options['compression'])
+        except ImproperlyConfigured as e:
+            raise CommandError(str(e))
+
+        output = options['output']
+        if output:
+            with open(output, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+            self.stderr.write(
+                self.style.SUCCESS(f'Files of {user.username} exported to {output}')
+            )
+        else:
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
+
+    def get_user(self, value):
+        """
+        Find a user by id or username.
+        """
+        lookup = {'pk': int(value)} if value.isdigit() else {'username': value}
+        try:
+            return CustomUser.objects.get(**lookup)
+        except CustomUser.DoesNotExist:
+            raise CommandError(f'User "{value}" does not exist')
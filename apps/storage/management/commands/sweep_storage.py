@@ -0,0 +1,60 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.storage.sweeper import sweep_storage
+
+
+class Command(BaseCommand):
+    help = "Find files in user storage directories and the blob store that nothing points to"
+
+    def add_arguments(self, parser):
+        action = parser.add_mutually_exclusive_group()
+        action.add_argument(
+            '--dry-run',
+            action='store_const',
+            const='report',
+            dest='action',
+            help='Only list the unreferenced files'
+        )
+        action.add_argument(
+            '--quarantine',
+            action='store_const',
+            const='quarantine',
+            dest='action',
+            help='Move the files to the quarantine directory'
+        )
+        action.add_argument(
+            '--delete',
+            action='store_const',
+            const='delete',
+            dest='action',
+            help='Delete the files'
+        )
+        parser.add_argument(
+            '--grace-period',
+            type=int,
+            default=settings.STORAGE_SWEEP_GRACE_PERIOD,
+            help='Skip files modified within this many seconds'
+        )
+
+    def handle(self, *args, **options):
+        """
+        Sweep the user storage directories and the blob store.
+
+        Without an action flag the STORAGE_SWEEP_ACTION
+        setting is used.
+        """
+        result = sweep_storage(
+            options['action'] or settings.STORAGE_SWEEP_ACTION,
+            grace_period=options['grace_period'],
+            report=lambda name, size: self.stdout.write(f'{name}\t{size}')
+        )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{result['action']}: {result['unreferenced_files']} files, "
+                f"{result['unreferenced_bytes']} bytes; purged from quarantine: "
+                f"{result['quarantine_purged_files']} files, "
+                f"{result['quarantine_purged_bytes']} bytes"
+            )
+        )
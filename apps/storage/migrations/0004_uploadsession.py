@@ -0,0 +1,35 @@
+# Generated by Django 4.2 on 2026-10-17 00:22
+
+import apps.storage.models
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('storage', '0003_alter_userfile_shared_expiry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadSession',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('original_name', models.CharField(max_length=255)),
+                ('file', models.FileField(max_length=255, upload_to=apps.storage.models.user_directory_path)),
+                ('size', models.BigIntegerField(help_text='Total size of the file being uploaded in bytes')),
+                ('offset', models.BigIntegerField(default=0, help_text='Number of bytes received so far')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Upload session',
+                'verbose_name_plural': 'Upload sessions',
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2 on 2026-10-17 00:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storage', '0005_blob'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userfile',
+            index=models.Index(fields=['user', 'upload_date', 'id'], name='userfile_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userfile',
+            index=models.Index(fields=['user', 'original_name', 'id'], name='userfile_user_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userfile',
+            index=models.Index(fields=['user', 'size', 'id'], name='userfile_user_size_idx'),
+        ),
+    ]
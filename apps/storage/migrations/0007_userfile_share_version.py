@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-17 00:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storage', '0006_userfile_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userfile',
+            name='share_version',
+            field=models.PositiveIntegerField(default=0, help_text='Bumped to revoke all signed share links'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2 on 2026-10-17 00:42
+
+from django.db import migrations, models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storage', '0007_userfile_share_version'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='userfile',
+            name='shared_link',
+            field=models.UUIDField(blank=True, default=uuid.uuid4, null=True, unique=True),
+        ),
+        migrations.AddIndex(
+            model_name='userfile',
+            index=models.Index(condition=models.Q(('shared_expiry__isnull', False)), fields=['shared_expiry'], name='userfile_shared_expiry_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2 on 2026-10-17 00:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storage', '0008_userfile_shared_link_expiry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userfile',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, help_text='When the file was moved to the trash', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='userfile',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', False)), fields=['deleted_at'], name='userfile_deleted_at_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2 on 2026-10-17 00:48
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('storage', '0009_userfile_deleted_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FileChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file_id', models.BigIntegerField(help_text='Id of the changed UserFile (kept after it is deleted)')),
+                ('action', models.CharField(choices=[('created', 'Created'), ('updated', 'Updated'), ('deleted', 'Deleted')], max_length=16)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'File change',
+                'verbose_name_plural': 'File changes',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='filechange',
+            index=models.Index(fields=['user', 'id'], name='filechange_user_id_idx'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 4.2 on 2026-10-17 02:10
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def reserve_open_sessions(apps, schema_editor):
+    # Open sessions now hold a reservation that is released when
+    # they are completed or deleted, so it has to exist for them
+    CustomUser = apps.get_model('accounts', 'CustomUser')
+    UploadSession = apps.get_model('storage', 'UploadSession')
+    reserved = UploadSession.objects.filter(
+        user=OuterRef('pk')
+    ).order_by().values('user').annotate(
+        total=Sum('size')
+    ).values('total')
+    CustomUser.objects.filter(
+        pk__in=UploadSession.objects.values('user')
+    ).update(
+        storage_used=F('storage_used') + Coalesce(
+            Subquery(reserved),
+            0,
+            output_field=models.BigIntegerField()
+        )
+    )
+
+
+def release_open_sessions(apps, schema_editor):
+    CustomUser = apps.get_model('accounts', 'CustomUser')
+    UploadSession = apps.get_model('storage', 'UploadSession')
+    reserved = UploadSession.objects.filter(
+        user=OuterRef('pk')
+    ).order_by().values('user').annotate(
+        total=Sum('size')
+    ).values('total')
+    CustomUser.objects.filter(
+        pk__in=UploadSession.objects.values('user')
+    ).update(
+        storage_used=F('storage_used') - Coalesce(
+            Subquery(reserved),
+            0,
+            output_field=models.BigIntegerField()
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_customuser_storage_used'),
+        ('storage', '0010_filechange'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            reserve_open_sessions,
+            release_open_sessions
+        ),
+    ]
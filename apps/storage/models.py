@@ -1,11 +1,19 @@
+import logging
 import os
 import uuid
+from collections import Counter, defaultdict
 
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
 from django.utils import timezone
 
 from apps.accounts.models import CustomUser
 
+from .caching import bump_file_list_generation, invalidate_shared_link
+
+logger = logging.getLogger(__name__)
+
 
 def user_directory_path(instance, filename):
     """
@@ -26,6 +34,60 @@ def user_directory_path(instance, filename):
     )
 
 
+def blob_path(instance, filename):
+    """
+    Create a content-addressed path to store a blob.
+    Blobs are sharded by the first two bytes of their
+    SHA-256 digest: blobs/<ab>/<cd>/<abcd...>.
+
+    :param instance: The Blob instance to generate a path for
+    :param filename: Ignored, the digest is used as the file name
+    :return: A string representing the path to store the blob
+    """
+    digest = instance.sha256
+    return os.path.join('blobs', digest[:2], digest[2:4], digest)
+
+
+class Blob(models.Model):
+    sha256 = models.CharField(
+        max_length=64,
+        unique=True
+    )
+    file = models.FileField(
+        upload_to=blob_path,
+        max_length=255
+    )
+    size = models.BigIntegerField()
+    ref_count = models.PositiveIntegerField(
+        default=0,
+        help_text="Number of files referencing this content"
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True
+    )
+
+    def __str__(self):
+        """
+        Return a string representation of the Blob.
+
+        :return: The SHA-256 digest of the blob content.
+        """
+        return self.sha256
+
+    class Meta:
+        verbose_name = 'Blob'
+        verbose_name_plural = 'Blobs'
+
+
+class UserFileManager(models.Manager):
+    """
+    Manager of the files that are not in the trash.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 class UserFile(models.Model):
     user = models.ForeignKey(
         CustomUser,
@@ -37,6 +99,12 @@ class UserFile(models.Model):
     file = models.FileField(
         upload_to=user_directory_path
     )
+    blob = models.ForeignKey(
+        Blob,
+        null=True,
+        blank=True,
+        on_delete=models.PROTECT
+    )
     size = models.BigIntegerField()
     upload_date = models.DateTimeField(
         auto_now_add=True
@@ -50,13 +118,27 @@ class UserFile(models.Model):
     )
     shared_link = models.UUIDField(
         default=uuid.uuid4,
-        unique=True
+        unique=True,
+        null=True,
+        blank=True
     )
     shared_expiry = models.DateTimeField(
         null=True,
         blank=True,
         help_text="Link expiration date and time"
     )
+    share_version = models.PositiveIntegerField(
+        default=0,
+        help_text="Bumped to revoke all signed share links"
+    )
+    deleted_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="When the file was moved to the trash"
+    )
+
+    objects = UserFileManager()
+    all_objects = models.Manager()
 
     def save(self, *args, **kwargs):
         """
@@ -66,6 +148,11 @@ class UserFile(models.Model):
         set the size and original_name fields from the
         file, and then save the model again with only
         the size and original_name fields updated.
+        A new file is charged to the owner's storage usage
+        in the same transaction, and the change is written to
+        the owner's change log. Once the transaction commits,
+        the owner's cached file list and the cached resolution
+        of the file's shared link are invalidated.
 
         :param args: Additional positional arguments
         to pass to the save() method.
@@ -73,31 +160,133 @@ class UserFile(models.Model):
         to pass to the save() method.
         :return: None
         """
-        if self.file and not self.pk:
-            file = self.file
-            self.file = None
+        adding = self._state.adding
+
+        with transaction.atomic():
+            if self.file and not self.pk:
+                file = self.file
+                self.file = None
+
+                super().save(*args, **kwargs)
+
+                self.file = file
+                self.size = file.size
+                self.original_name = os.path.basename(file.name)
 
             super().save(*args, **kwargs)
 
-            self.file = file
-            self.size = file.size
-            self.original_name = os.path.basename(file.name)
+            if adding:
+                self.user.add_storage_usage(self.size)
+
+            record_file_changes(
+                FileChange.CREATED if adding else FileChange.UPDATED,
+                self.user_id,
+                [self.pk]
+            )
+            self._on_commit_invalidate()
 
-        super().save(*args, **kwargs)
+    def set_blob(self, blob):
+        """
+        Point the file at stored blob content.
+
+        :param blob: The Blob holding the file content.
+        """
+        self.blob = blob
+        self.file.name = blob.file.name
 
     def delete(self, *args, **kwargs):
         """
         Delete the file from storage 
         and then delete the model instance.
+
+        Files backed by a shared blob only drop their
+        reference; the blob content is removed together
+        with its last reference. The file size is released
+        from the owner's storage usage (unless the file is in
+        the trash, which has released it already), and the
+        owner's cached file list and shared link resolution
+        are invalidated.
         """
-        try:
-            if self.file:
-                storage, path = self.file.storage, self.file.path
-                storage.delete(path)
-        except Exception as e:
-            print(e)
-        finally:
-            super().delete(*args, **kwargs)
+        from .blobs import release_blob
+
+        if not self.blob_id:
+            try:
+                if self.file:
+                    storage, path = self.file.storage, self.file.path
+                    storage.delete(path)
+            except Exception as e:
+                print(e)
+
+        with transaction.atomic():
+            file_id = self.pk
+            result = super().delete(*args, **kwargs)
+            if self.deleted_at is None:
+                self.user.add_storage_usage(-self.size)
+                record_file_changes(FileChange.DELETED, self.user_id, [file_id])
+            if self.blob_id:
+                release_blob(self.blob_id)
+
+            self._on_commit_invalidate()
+        return result
+
+    def _on_commit_invalidate(self):
+        """
+        Invalidate the owner's cached file list and the cached
+        shared link resolution once the transaction commits.
+        """
+        user_id, shared_link = self.user_id, self.shared_link
+        transaction.on_commit(
+            lambda: bump_file_list_generation(user_id)
+        )
+        transaction.on_commit(
+            lambda: invalidate_shared_link(shared_link)
+        )
+
+    def trash(self):
+        """
+        Move the file to the trash.
+
+        Only the row is marked, so this takes the same time
+        for any file. The size is released from the owner's
+        storage usage right away; the content is removed
+        later by purge_trash_task.
+
+        :return: True if the file has been moved to the trash
+        """
+        with transaction.atomic():
+            now = timezone.now()
+            moved = UserFile.objects.filter(pk=self.pk).update(deleted_at=now)
+            if moved:
+                self.deleted_at = now
+                self.user.add_storage_usage(-self.size)
+                record_file_changes(FileChange.DELETED, self.user_id, [self.pk])
+                self._on_commit_invalidate()
+        return bool(moved)
+
+    def restore(self):
+        """
+        Take the file out of the trash.
+
+        The size is charged to the owner's storage usage
+        again, so the file is only restored if it fits.
+
+        :return: True if the file has been restored, False
+        if the owner does not have enough free space
+        """
+        with transaction.atomic():
+            if not self.user.has_storage_space(self.size, for_update=True):
+                return False
+
+            restored = UserFile.all_objects.filter(
+                pk=self.pk,
+                deleted_at__isnull=False
+            ).update(deleted_at=None)
+            if restored:
+                self.deleted_at = None
+                self.user.add_storage_usage(self.size)
+                record_file_changes(FileChange.CREATED, self.user_id, [self.pk])
+                self._on_commit_invalidate()
+        return True
 
     def is_shared_link_expired(self):
         """
@@ -147,3 +336,263 @@ class UserFile(models.Model):
     class Meta:
         verbose_name = 'File'
         verbose_name_plural = 'Files'
+        indexes = [
+            # Keyset pagination of the file list, one per ordering
+            models.Index(
+                fields=['user', 'upload_date', 'id'],
+                name='userfile_user_date_idx'
+            ),
+            models.Index(
+                fields=['user', 'original_name', 'id'],
+                name='userfile_user_name_idx'
+            ),
+            models.Index(
+                fields=['user', 'size', 'id'],
+                name='userfile_user_size_idx'
+            ),
+            # Catch-up sweep of expired share links
+            models.Index(
+                fields=['shared_expiry'],
+                name='userfile_shared_expiry_idx',
+                condition=models.Q(shared_expiry__isnull=False)
+            ),
+            # Trash listing and purge
+            models.Index(
+                fields=['deleted_at'],
+                name='userfile_deleted_at_idx',
+                condition=models.Q(deleted_at__isnull=False)
+            ),
+        ]
+
+
+class FileChange(models.Model):
+    CREATED = 'created'
+    UPDATED = 'updated'
+    DELETED = 'deleted'
+    ACTION_CHOICES = [
+        (CREATED, 'Created'),
+        (UPDATED, 'Updated'),
+        (DELETED, 'Deleted'),
+    ]
+
+    user = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE
+    )
+    file_id = models.BigIntegerField(
+        help_text="Id of the changed UserFile (kept after it is deleted)"
+    )
+    action = models.CharField(
+        max_length=16,
+        choices=ACTION_CHOICES
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True
+    )
+
+    def __str__(self):
+        """
+        Return a string representation of the FileChange.
+
+        :return: The action and the id of the changed file.
+        """
+        return f"{self.action}: {self.file_id}"
+
+    class Meta:
+        verbose_name = 'File change'
+        verbose_name_plural = 'File changes'
+        indexes = [
+            # Changes feed: events of a user after a cursor
+            models.Index(
+                fields=['user', 'id'],
+                name='filechange_user_id_idx'
+            ),
+        ]
+
+
+def record_file_changes(action, user_id, file_ids):
+    """
+    Write changes of a user's files to the change log.
+
+    :param action: One of the FileChange actions
+    :param user_id: The id of the user owning the files
+    :param file_ids: Primary keys of the changed files
+    """
+    FileChange.objects.bulk_create([
+        FileChange(user_id=user_id, file_id=file_id, action=action)
+        for file_id in file_ids
+    ])
+
+
+def trash_files(user, file_ids):
+    """
+    Move many files of a user to the trash at once.
+
+    The bulk counterpart of UserFile.trash: one UPDATE
+    marks the rows, one releases their total size from
+    the owner's storage usage and the changes are logged
+    with one INSERT. Caches are not invalidated here, the
+    caller does it once for the whole batch.
+
+    :param user: The owner of the files
+    :param file_ids: Primary keys of the files to trash
+    :return: The number of files moved to the trash
+    """
+    with transaction.atomic():
+        rows = list(
+            UserFile.objects.select_for_update().filter(
+                user=user,
+                pk__in=file_ids
+            ).values_list('pk', 'size')
+        )
+        trashed_ids = [pk for pk, _ in rows]
+        trashed = UserFile.objects.filter(pk__in=trashed_ids).update(
+            deleted_at=timezone.now()
+        )
+
+        total_size = sum(size for _, size in rows)
+        if total_size:
+            user.add_storage_usage(-total_size)
+        record_file_changes(FileChange.DELETED, user.pk, trashed_ids)
+    return trashed
+
+
+def delete_files(file_ids):
+    """
+    Delete many files at once.
+
+    Does what UserFile.delete does for every file (trashed
+    or not), but in bulk: the rows go in a single DELETE, the storage usage
+    of each owner and the references of each blob are
+    released with one update apiece, and the content of
+    legacy (blob-less) files is removed from disk once the
+    transaction commits.
+
+    :param file_ids: Primary keys of the files to delete
+    :return: The number of deleted files
+    """
+    from .blobs import release_blob
+
+    with transaction.atomic():
+        rows = list(
+            UserFile.all_objects.select_for_update().filter(
+                pk__in=file_ids
+            ).values_list(
+                'id', 'user_id', 'size', 'blob_id', 'file',
+                'shared_link', 'deleted_at'
+            )
+        )
+        if not rows:
+            return 0
+
+        UserFile.all_objects.filter(pk__in=[row[0] for row in rows]).delete()
+
+        usage, blobs, names = Counter(), Counter(), []
+        deleted_ids = defaultdict(list)
+        for file_id, user_id, size, blob_id, name, _, deleted_at in rows:
+            # Files in the trash have released their size
+            # and logged their deletion already
+            usage[user_id] += 0 if deleted_at else size
+            if not deleted_at:
+                deleted_ids[user_id].append(file_id)
+            if blob_id:
+                blobs[blob_id] += 1
+            elif name:
+                names.append(name)
+
+        for user_id, size in usage.items():
+            if not size:
+                continue
+            CustomUser.objects.filter(pk=user_id).update(
+                storage_used=Greatest(F('storage_used') - size, 0)
+            )
+            CustomUser(pk=user_id).invalidate_cache()
+        for blob_id, count in blobs.items():
+            release_blob(blob_id, count)
+        for user_id, file_ids in deleted_ids.items():
+            record_file_changes(FileChange.DELETED, user_id, file_ids)
+
+        storage = UserFile._meta.get_field('file').storage
+        shared_links = [row[5] for row in rows]
+
+        def cleanup():
+            for name in names:
+                storage.delete(name)
+            for user_id in usage:
+                bump_file_list_generation(user_id)
+            invalidate_shared_link(*shared_links)
+
+        transaction.on_commit(cleanup)
+
+    return len(rows)
+
+
+class UploadSession(models.Model):
+    id = models.UUIDField(
+        primary_key=True,
+        default=uuid.uuid4,
+        editable=False
+    )
+    user = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE
+    )
+    original_name = models.CharField(
+        max_length=255
+    )
+    file = models.FileField(
+        upload_to=user_directory_path,
+        max_length=255
+    )
+    size = models.BigIntegerField(
+        help_text="Total size of the file being uploaded in bytes"
+    )
+    offset = models.BigIntegerField(
+        default=0,
+        help_text="Number of bytes received so far"
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True
+    )
+
+    @property
+    def is_complete(self):
+        """
+        Check if every byte of the file has been received.
+
+        :return: True if the offset has reached the declared size.
+        """
+        return self.offset == self.size
+
+    def delete(self, *args, **kwargs):
+        """
+        Delete the partially uploaded file, then delete the
+        session and release the storage reserved for it.
+        """
+        try:
+            if self.file:
+                self.file.storage.delete(self.file.name)
+        except Exception as e:
+            logger.warning(f"Upload file {self.file.name} not deleted: {e}")
+
+        with transaction.atomic():
+            deleted = super().delete(*args, **kwargs)
+            # A session deleted concurrently has released it already
+            if deleted[0]:
+                self.user.add_storage_usage(-self.size)
+        return deleted
+
+    def __str__(self):
+        """
+        Return a string representation of the UploadSession.
+
+        :return: The original file name and upload progress.
+        """
+        return f"{self.original_name} ({self.offset}/{self.size})"
+
+    class Meta:
+        verbose_name = 'Upload session'
+        verbose_name_plural = 'Upload sessions'
@@ -0,0 +1,188 @@
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from django.utils.encoding import force_str
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class FileCursorPagination(BasePagination):
+    """
+    Keyset pagination of a user's files.
+
+    Rows are ordered by (<ordering field>, id) and every page
+    is fetched with a "WHERE (field, id) > (last field, last id)"
+    style condition instead of an OFFSET, so each page costs the
+    same no matter how deep into the list it is. The cursor is
+    an opaque base64 token holding the boundary row's values.
+    """
+    page_size = 100
+    max_page_size = 1000
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    ordering_param = 'ordering'
+    ordering_fields = ('upload_date', 'original_name', 'size')
+    default_ordering = '-upload_date'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        Return one page of the queryset.
+
+        :param queryset: The filtered queryset
+        :param request: The request object
+        :param view: The view being paginated
+        :return: A list with the objects of the page
+        """
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.field, self.descending = self.get_ordering(request)
+        cursor = self.decode_cursor(request, queryset.model)
+
+        is_previous = bool(cursor and cursor['previous'])
+        # Walking backwards uses the reversed order and flips the page back
+        descending = self.descending != is_previous
+        prefix = '-' if descending else ''
+        queryset = queryset.order_by(f'{prefix}{self.field}', f'{prefix}id')
+
+        if cursor:
+            value = cursor['value']
+            lookup = 'lt' if descending else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'{self.field}__{lookup}': value})
+                | Q(**{self.field: value, f'id__{lookup}': cursor['id']})
+            )
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+
+        if is_previous:
+            results.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+
+        self.page = results
+        return results
+
+    def get_page_size(self, request):
+        """
+        Return the page size requested by the client,
+        limited to max_page_size.
+        """
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def get_ordering(self, request):
+        """
+        Return the ordering field and direction requested by the client.
+
+        :return: A tuple of the field name and True for descending order
+        """
+        ordering = request.query_params.get(
+            self.ordering_param,
+            self.default_ordering
+        )
+        field = ordering.lstrip('-')
+        if field not in self.ordering_fields:
+            raise ValidationError({
+                self.ordering_param: f'Ordering must be one of: '
+                f'{", ".join(self.ordering_fields)}'
+            })
+        return field, ordering.startswith('-')
+
+    def decode_cursor(self, request, model):
+        """
+        Decode the cursor query parameter.
+
+        :param request: The request object
+        :param model: The model being paginated, used to
+        convert the boundary value of the ordering field
+        :return: A dict with the boundary values, or None
+        if the first page is requested
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            if cursor['field'] != self.field:
+                raise ValueError('The cursor belongs to another ordering')
+            return {
+                'value': model._meta.get_field(self.field).to_python(
+                    cursor['value']
+                ),
+                'id': int(cursor['id']),
+                'previous': bool(cursor.get('previous'))
+            }
+        except (TypeError, ValueError, KeyError, DjangoValidationError):
+            raise NotFound('Invalid cursor')
+
+    def encode_cursor(self, obj, previous=False):
+        """
+        Build the URL of the page next to the given boundary object.
+        """
+        value = getattr(obj, self.field)
+        payload = {
+            'field': self.field,
+            'value': force_str(
+                value.isoformat() if hasattr(value, 'isoformat') else value
+            ),
+            'id': obj.pk,
+            'previous': previous
+        }
+        encoded = base64.urlsafe_b64encode(
+            json.dumps(payload).encode()
+        ).decode()
+        return replace_query_param(
+            self.base_url,
+            self.cursor_query_param,
+            encoded
+        )
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1])
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], previous=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data)
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {
+                    'type': 'string',
+                    'nullable': True,
+                    'format': 'uri'
+                },
+                'previous': {
+                    'type': 'string',
+                    'nullable': True,
+                    'format': 'uri'
+                },
+                'results': schema,
+            },
+        }
@@ -1,9 +1,13 @@
+import uuid
 from datetime import timedelta
 
+from django.conf import settings
 from django.utils import timezone
 from rest_framework import serializers
 
-from .models import UserFile
+from .archives import TAR_COMPRESSIONS
+from .models import UploadSession, UserFile
+from .tasks import schedule_shared_link_expiry
 
 
 class FileSerializer(serializers.ModelSerializer):
@@ -22,6 +26,7 @@ class FileSerializer(serializers.ModelSerializer):
             'shared_link',
             'shared_expiry',
             'is_shared_expired',
+            'deleted_at',
             'user'
         ]
         read_only_fields = [
@@ -31,6 +36,7 @@ class FileSerializer(serializers.ModelSerializer):
             'last_download',
             'shared_link',
             'is_shared_expired',
+            'deleted_at',
             'user'
         ]
 
@@ -53,10 +59,143 @@ class FileShareSerializer(serializers.ModelSerializer):
         read_only_fields = ['shared_link', 'shared_expiry']
 
     def update(self, instance, validated_data):
+        """
+        Create a new shared link for the file.
+
+        A link with an expiry date is queued in Redis once the
+        transaction commits and switched off shortly after that
+        moment by expire_shared_links_task.
+        """
         expiry_days = validated_data.pop('expiry_days', None)
-        
+
+        instance.shared_expiry = None
         if expiry_days:
             instance.shared_expiry = timezone.now() + timedelta(days=expiry_days)
-            instance.save()
-        
+        instance.shared_link = uuid.uuid4()
+        instance.save()
+        schedule_shared_link_expiry(instance)
+
         return instance
+
+
+class SignedShareSerializer(serializers.Serializer):
+    expiry_days = serializers.IntegerField(
+        write_only=True,
+        required=False,
+        min_value=1,
+        max_value=365,
+        help_text="The number of days the link is valid"
+    )
+    token = serializers.CharField(read_only=True)
+    url = serializers.CharField(read_only=True)
+    expires = serializers.DateTimeField(read_only=True)
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    size = serializers.IntegerField(
+        min_value=0,
+        help_text="Total size of the file in bytes"
+    )
+
+    class Meta:
+        model = UploadSession
+        fields = [
+            'id',
+            'original_name',
+            'size',
+            'offset',
+            'created_at',
+            'updated_at'
+        ]
+        read_only_fields = [
+            'id',
+            'offset',
+            'created_at',
+            'updated_at'
+        ]
+
+
+class InstantUploadSerializer(serializers.Serializer):
+    original_name = serializers.CharField(
+        max_length=255
+    )
+    sha256 = serializers.RegexField(
+        regex='^[0-9a-f]{64}$',
+        help_text="SHA-256 digest of the file content (lowercase hex)"
+    )
+    size = serializers.IntegerField(
+        min_value=0,
+        help_text="Size of the file in bytes"
+    )
+    challenge = serializers.UUIDField(
+        required=False,
+        help_text="Challenge returned by the first request"
+    )
+    proof = serializers.RegexField(
+        regex='^[0-9a-f]{64}$',
+        required=False,
+        help_text="SHA-256 digest of the challenge byte range (lowercase hex)"
+    )
+
+    def validate(self, attrs):
+        for field, other in (('proof', 'challenge'), ('challenge', 'proof')):
+            if other in attrs and field not in attrs:
+                raise serializers.ValidationError({
+                    field: f"This field is required with {other}"
+                })
+        return attrs
+
+
+class ArchiveRequestSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.ARCHIVE_MAX_FILES,
+        help_text="Ids of the files to put into the archive"
+    )
+
+
+class ExportRequestSerializer(serializers.Serializer):
+    compression = serializers.ChoiceField(
+        choices=TAR_COMPRESSIONS,
+        required=False,
+        help_text="Compress the archive (zstd)"
+    )
+
+
+class BulkOperationSerializer(serializers.Serializer):
+    OPERATIONS = ('rename', 'comment', 'share', 'unshare', 'delete')
+
+    id = serializers.IntegerField(min_value=1)
+    op = serializers.ChoiceField(choices=OPERATIONS)
+    original_name = serializers.CharField(
+        max_length=255,
+        required=False
+    )
+    comment = serializers.CharField(
+        allow_blank=True,
+        required=False
+    )
+    expiry_days = serializers.IntegerField(
+        required=False,
+        min_value=1,
+        max_value=365,
+        help_text="The number of days the link is valid"
+    )
+
+    def validate(self, attrs):
+        required = {'rename': 'original_name', 'comment': 'comment'}
+        field = required.get(attrs['op'])
+        if field and field not in attrs:
+            raise serializers.ValidationError({
+                field: f"This field is required for {attrs['op']}"
+            })
+        return attrs
+
+
+class BulkRequestSerializer(serializers.Serializer):
+    operations = serializers.ListField(
+        child=BulkOperationSerializer(),
+        allow_empty=False,
+        max_length=settings.BULK_MAX_OPERATIONS
+    )
@@ -0,0 +1,47 @@
+from django.core import signing
+from django.utils import timezone
+
+SIGNED_SHARE_SALT = 'apps.storage.signed-share'
+
+
+def make_share_token(user_file, expires=None):
+    """
+    Create a signed share token for a file.
+
+    The token carries the file id, the file's share_version
+    and the expiry time, signed with a key derived from
+    SECRET_KEY, so it can be checked without the database.
+    Bumping share_version revokes every token issued before.
+
+    :param user_file: The UserFile to share
+    :param expires: The expiry datetime, or None for no expiry
+    :return: The URL-safe token string
+    """
+    payload = {
+        'f': user_file.pk,
+        'v': user_file.share_version,
+        'e': int(expires.timestamp()) if expires else None,
+    }
+    return signing.dumps(payload, salt=SIGNED_SHARE_SALT)
+
+
+def read_share_token(token):
+    """
+    Check a signed share token.
+
+    :param token: The token from the share URL
+    :return: A tuple of the file id and the share version
+    :raises signing.SignatureExpired: If the token has expired
+    :raises signing.BadSignature: If the token is forged or malformed
+    """
+    payload = signing.loads(token, salt=SIGNED_SHARE_SALT)
+
+    try:
+        file_id, version, expires = payload['f'], payload['v'], payload['e']
+    except (TypeError, KeyError):
+        raise signing.BadSignature('Malformed share token')
+
+    if expires is not None and expires < timezone.now().timestamp():
+        raise signing.SignatureExpired('Share token has expired')
+
+    return file_id, version
@@ -0,0 +1,28 @@
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+
+from apps.accounts.models import CustomUser
+
+from .models import UploadSession, UserFile, delete_files
+
+
+@receiver(pre_delete, sender=CustomUser)
+def delete_user_files(sender, instance, **kwargs):
+    """
+    Delete the files and upload sessions of a user before the user.
+
+    The database cascade would remove the rows without releasing
+    their blobs or deleting their content from disk, so the files
+    go through delete_files first. Users removed by purge_user_task
+    have no files left by then.
+    """
+    file_ids = list(
+        UserFile.all_objects.filter(user=instance).values_list(
+            'pk',
+            flat=True
+        )
+    )
+    if file_ids:
+        delete_files(file_ids)
+    for session in UploadSession.objects.filter(user=instance):
+        session.delete()
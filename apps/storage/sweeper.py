@@ -0,0 +1,265 @@
+import logging
+import os
+import re
+import stat
+import time
+from itertools import chain
+
+from django.conf import settings
+
+from .models import Blob, UploadSession, UserFile
+
+logger = logging.getLogger(__name__)
+
+USER_DIRECTORY_RE = re.compile(r'^user_(\d+)_storage$')
+SWEEP_ACTIONS = ('report', 'quarantine', 'delete')
+BLOB_DIRECTORY = 'blobs'
+
+
+def _unreferenced(user_id, batch):
+    """
+    Return the entries of a batch that no row points to.
+
+    Stored files (including those in the trash) and open
+    upload sessions count as references. The lookup is
+    limited to the owner's rows.
+    """
+    batch.sort()
+    names = [name for name, _, _ in batch]
+    referenced = set(
+        UserFile.all_objects.filter(
+            user_id=user_id,
+            file__in=names
+        ).values_list('file', flat=True)
+    )
+    referenced.update(
+        UploadSession.objects.filter(
+            user_id=user_id,
+            file__in=names
+        ).values_list('file', flat=True)
+    )
+    return [entry for entry in batch if entry[0] not in referenced]
+
+
+def iter_unreferenced_files(root, grace_period, batch_size):
+    """
+    Find files in the user storage directories that are not referenced.
+
+    Every user_<id>_storage directory is walked with os.scandir
+    and its files are checked against the database in sorted
+    batches, so neither the directory listing nor the table
+    is ever loaded whole. Files modified within the grace
+    period are skipped, they may belong to an upload that
+    has not been saved yet.
+
+    :param root: The storage root holding the user directories
+    :param grace_period: Minimum age of a file in seconds
+    :param batch_size: The number of names checked per query
+    :return: An iterator over (storage name, absolute path, size)
+    """
+    if not os.path.isdir(root):
+        return
+    cutoff = time.time() - grace_period
+
+    with os.scandir(root) as directories:
+        for directory in directories:
+            match = USER_DIRECTORY_RE.match(directory.name)
+            if not match or not directory.is_dir(follow_symlinks=False):
+                continue
+            user_id = int(match.group(1))
+
+            batch = []
+            with os.scandir(directory.path) as entries:
+                for entry in entries:
+                    if not entry.is_file(follow_symlinks=False):
+                        continue
+                    stat = entry.stat(follow_symlinks=False)
+                    if stat.st_mtime > cutoff:
+                        continue
+
+                    batch.append((
+                        f'{directory.name}/{entry.name}',
+                        entry.path,
+                        stat.st_size
+                    ))
+                    if len(batch) >= batch_size:
+                        yield from _unreferenced(user_id, batch)
+                        batch = []
+
+            if batch:
+                yield from _unreferenced(user_id, batch)
+
+
+def _unreferenced_blobs(batch):
+    """
+    Return the entries of a batch of blob files without a Blob row.
+
+    Blob files are named after their digest, so the lookup goes
+    through the unique sha256 index and the stored name is then
+    compared, which also catches files outside the sharded layout
+    (e.g. leftovers in the staging directory).
+    """
+    batch.sort()
+    digests = [os.path.basename(name) for name, _, _ in batch]
+    referenced = set(
+        Blob.objects.filter(
+            sha256__in=digests
+        ).values_list('file', flat=True)
+    )
+    return [entry for entry in batch if entry[0] not in referenced]
+
+
+def iter_unreferenced_blobs(root, grace_period, batch_size):
+    """
+    Find files in the blob store that no Blob row points to.
+
+    The blob directory is walked recursively and its files are
+    checked against the database in sorted batches. Files modified
+    within the grace period are skipped, they may belong to an
+    upload whose transaction has not been committed yet.
+
+    :param root: The storage root holding the blob directory
+    :param grace_period: Minimum age of a file in seconds
+    :param batch_size: The number of names checked per query
+    :return: An iterator over (storage name, absolute path, size)
+    """
+    directory = os.path.join(root, BLOB_DIRECTORY)
+    cutoff = time.time() - grace_period
+
+    batch = []
+    for dirpath, _, filenames in os.walk(directory):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            try:
+                info = os.lstat(path)
+            except FileNotFoundError:
+                continue
+            if not stat.S_ISREG(info.st_mode) or info.st_mtime > cutoff:
+                continue
+
+            name = os.path.relpath(path, root).replace(os.sep, '/')
+            batch.append((name, path, info.st_size))
+            if len(batch) >= batch_size:
+                yield from _unreferenced_blobs(batch)
+                batch = []
+
+    if batch:
+        yield from _unreferenced_blobs(batch)
+
+
+def purge_quarantine(retention=None):
+    """
+    Delete files that have been in the quarantine for too long.
+
+    The quarantine time is the modification time, which is set
+    when a file is moved there. Directories left empty are
+    removed as well.
+
+    :param retention: Seconds a file is kept in the quarantine,
+    STORAGE_SWEEP_QUARANTINE_RETENTION by default
+    :return: A dict with the number and total size of the deleted files
+    """
+    if retention is None:
+        retention = settings.STORAGE_SWEEP_QUARANTINE_RETENTION
+
+    root = UserFile._meta.get_field('file').storage.location
+    quarantine = os.path.join(root, settings.STORAGE_SWEEP_QUARANTINE_DIR)
+    cutoff = time.time() - retention
+    count = total_size = 0
+
+    for dirpath, _, filenames in os.walk(quarantine, topdown=False):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            try:
+                info = os.lstat(path)
+                if info.st_mtime > cutoff:
+                    continue
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            except OSError as e:
+                logger.warning(f"Quarantined file {path} not purged: {e}")
+                continue
+            count += 1
+            total_size += info.st_size
+
+        if dirpath != quarantine:
+            try:
+                os.rmdir(dirpath)
+            except OSError:
+                pass
+
+    return {
+        'purged_files': count,
+        'purged_bytes': total_size
+    }
+
+
+def sweep_storage(action='report', grace_period=None, batch_size=None, report=None):
+    """
+    Reclaim files left on disk without a UserFile or Blob row.
+
+    Both the user storage directories and the blob store are
+    swept. Unless only reporting, files kept in the quarantine
+    longer than STORAGE_SWEEP_QUARANTINE_RETENTION are deleted.
+
+    :param action: 'report' only lists the files (dry run),
+    'quarantine' moves them to STORAGE_SWEEP_QUARANTINE_DIR
+    under the storage root, 'delete' removes them
+    :param grace_period: Minimum age of a file in seconds,
+    STORAGE_SWEEP_GRACE_PERIOD by default
+    :param batch_size: The number of names checked per query,
+    STORAGE_SWEEP_BATCH_SIZE by default
+    :param report: An optional callable receiving the storage
+    name and size of every unreferenced file
+    :return: A dict with the number and total size of the
+    unreferenced files and of the files purged from the quarantine
+    """
+    if action not in SWEEP_ACTIONS:
+        raise ValueError(f'Unknown sweep action: {action!r}')
+    if grace_period is None:
+        grace_period = settings.STORAGE_SWEEP_GRACE_PERIOD
+    if batch_size is None:
+        batch_size = settings.STORAGE_SWEEP_BATCH_SIZE
+
+    root = UserFile._meta.get_field('file').storage.location
+    quarantine = os.path.join(root, settings.STORAGE_SWEEP_QUARANTINE_DIR)
+    count = total_size = 0
+
+    unreferenced = chain(
+        iter_unreferenced_files(root, grace_period, batch_size),
+        iter_unreferenced_blobs(root, grace_period, batch_size)
+    )
+    for name, path, size in unreferenced:
+        if report:
+            report(name, size)
+
+        try:
+            if action == 'quarantine':
+                target = os.path.join(quarantine, name)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.replace(path, target)
+                # The retention is counted from the move
+                os.utime(target)
+            elif action == 'delete':
+                os.remove(path)
+        except FileNotFoundError:
+            continue
+        except OSError as e:
+            logger.warning(f"Unreferenced file {name} not swept: {e}")
+            continue
+
+        count += 1
+        total_size += size
+
+    purged = {'purged_files': 0, 'purged_bytes': 0}
+    if action != 'report':
+        purged = purge_quarantine()
+
+    return {
+        'action': action,
+        'unreferenced_files': count,
+        'unreferenced_bytes': total_size,
+        'quarantine_purged_files': purged['purged_files'],
+        'quarantine_purged_bytes': purged['purged_bytes']
+    }
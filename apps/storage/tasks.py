@@ -1,35 +1,128 @@
 # backend/apps/storage/tasks.py
 import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
 
 from celery import shared_task
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
 from django.utils import timezone
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError, ResponseError
 
-from apps.storage.models import UserFile
+from apps.storage.caching import (
+    bump_file_list_generation,
+    invalidate_shared_link,
+)
+from apps.storage.downloads import DOWNLOAD_EVENTS_KEY
+from apps.accounts.models import CustomUser
+from apps.storage.models import (
+    FileChange,
+    UploadSession,
+    UserFile,
+    delete_files,
+    record_file_changes,
+)
+from apps.storage.sweeper import sweep_storage
 
 logger = logging.getLogger(__name__)
 
+CLEANUP_CURSOR_KEY = 'cleanup_files_cursor'
+SHARED_LINK_EXPIRY_KEY = 'shared_link_expiry'
+
+
+def cleanup_missing_files(deadline):
+    """
+    Удаление записей UserFile, файлы которых пропали с диска.
+
+    Таблица проверяется пачками по первичному ключу, начиная
+    с курсора, сохраненного прошлым запуском, пока не выйдет
+    время. Файлы проверяются на диске в пуле потоков,
+    найденные записи удаляются одной пачкой.
+
+    :param deadline: Момент (time.monotonic()), после которого
+    новая пачка не начинается
+    :return: Кортеж (проверено записей, удалено записей)
+    """
+    cursor = cache.get(CLEANUP_CURSOR_KEY, 0)
+    storage = UserFile._meta.get_field('file').storage
+    checked_count = deleted_count = 0
+
+    def file_exists(name):
+        return bool(name) and os.path.exists(storage.path(name))
+
+    with ThreadPoolExecutor(max_workers=settings.CLEANUP_STAT_WORKERS) as pool:
+        while time.monotonic() < deadline:
+            batch = list(
+                UserFile.objects.filter(pk__gt=cursor).order_by('pk').values_list(
+                    'pk', 'file'
+                )[:settings.CLEANUP_BATCH_SIZE]
+            )
+            if not batch:
+                # Таблица пройдена целиком, следующий запуск начнет сначала
+                cursor = 0
+                break
+
+            exists = pool.map(file_exists, [name for _, name in batch])
+            missing = [pk for (pk, _), ok in zip(batch, exists) if not ok]
+            if missing:
+                deleted_count += delete_files(missing)
+
+            checked_count += len(batch)
+            cursor = batch[-1][0]
+
+    cache.set(CLEANUP_CURSOR_KEY, cursor, timeout=None)
+    return checked_count, deleted_count
+
 @shared_task(name="storage.tasks.cleanup_files_task")
 def cleanup_files_task():
     """Единственная задача для очистки файлов"""
     try:
         logger.info("=== STARTING CLEANUP TASK ===")
         
-        # Очистка битых файлов
-        orphaned_count = 0
-        for file in UserFile.objects.filter(file__isnull=False):
-            if not file.file_exists:
-                file.delete()
-                orphaned_count += 1
+        # Очистка битых файлов (инкрементально, в пределах бюджета времени)
+        deadline = time.monotonic() + settings.CLEANUP_TIME_BUDGET
+        checked_count, orphaned_count = cleanup_missing_files(deadline)
         
-        # Очистка просроченных ссылок
+        # Очистка просроченных ссылок: обычно их отключает
+        # expire_shared_links_task, здесь подбираются пропущенные,
+        # например, если очередь в Redis была потеряна
+        # (частичный индекс по shared_expiry)
         expired_files = UserFile.objects.filter(
             shared_expiry__lt=timezone.now()
         ).exclude(shared_link__isnull=True)
+        expired = list(
+            expired_files.values_list('pk', 'user_id', 'shared_link')
+        )
         expired_count = expired_files.update(shared_link=None, shared_expiry=None)
+        expired_by_user = {}
+        for file_id, user_id, _ in expired:
+            expired_by_user.setdefault(user_id, []).append(file_id)
+        for user_id, file_ids in expired_by_user.items():
+            record_file_changes(FileChange.UPDATED, user_id, file_ids)
+            bump_file_list_generation(user_id)
+        invalidate_shared_link(*(link for _, _, link in expired))
+
+        # Очистка брошенных сессий загрузки (резерв квоты освобождается)
+        abandoned_count = 0
+        abandoned_before = timezone.now() - timedelta(
+            seconds=settings.UPLOAD_SESSION_TTL
+        )
+        for session in UploadSession.objects.filter(
+            updated_at__lt=abandoned_before
+        ).select_related('user'):
+            session.delete()
+            abandoned_count += 1
         
         result = {
+            'files_checked': checked_count,
             'orphaned_files_deleted': orphaned_count,
-            'expired_links_cleared': expired_files.count()
+            'expired_links_cleared': expired_count,
+            'abandoned_uploads_deleted': abandoned_count
         }
         
         logger.info(f"=== TASK COMPLETE: {result} ===")
@@ -38,3 +131,242 @@ def cleanup_files_task():
     except Exception as e:
         logger.error(f"!!! TASK ERROR: {str(e)}", exc_info=True)
         raise
+
+
+@shared_task(name="storage.tasks.flush_download_events_task")
+def flush_download_events_task(batch_size=500):
+    """Запись буферизованных скачиваний в UserFile.last_download"""
+    redis = get_redis_connection('default')
+    key = cache.make_key(DOWNLOAD_EVENTS_KEY)
+    flushing_key = f'{key}:flushing'
+
+    # Забираем накопленный хеш целиком; новые события пишутся в новый ключ.
+    # Если прошлый запуск упал, сначала дописываем оставшиеся события.
+    if not redis.exists(flushing_key):
+        try:
+            redis.rename(key, flushing_key)
+        except ResponseError:
+            return {'download_events_flushed': 0}
+
+    events = {
+        int(file_id): datetime.fromtimestamp(float(ts), tz=dt_timezone.utc)
+        for file_id, ts in redis.hgetall(flushing_key).items()
+    }
+
+    file_ids = list(events)
+    user_ids = set()
+    flushed_count = 0
+    for start in range(0, len(file_ids), batch_size):
+        files = list(
+            UserFile.objects.filter(
+                pk__in=file_ids[start:start + batch_size]
+            ).only('id', 'user')
+        )
+        for user_file in files:
+            user_file.last_download = events[user_file.pk]
+            user_ids.add(user_file.user_id)
+        flushed_count += UserFile.objects.bulk_update(
+            files,
+            ['last_download']
+        )
+
+    redis.delete(flushing_key)
+    for user_id in user_ids:
+        bump_file_list_generation(user_id)
+
+    result = {'download_events_flushed': flushed_count}
+    logger.info(f"Download events flushed: {result}")
+    return result
+
+
+@shared_task(name="storage.tasks.sweep_storage_task")
+def sweep_storage_task(action=None):
+    """Поиск файлов на диске, на которые не ссылается ни одна запись"""
+    result = sweep_storage(
+        action or settings.STORAGE_SWEEP_ACTION,
+        report=lambda name, size: logger.info(
+            f"Unreferenced file: {name} ({size} bytes)"
+        )
+    )
+    logger.info(f"Storage sweep complete: {result}")
+    return result
+
+
+def schedule_shared_link_expiry(*user_files):
+    """
+    Поставить ссылки файлов в очередь на отключение.
+
+    После коммита транзакции ссылка добавляется в отсортированное
+    множество Redis с моментом истечения в качестве веса, наступившие
+    ссылки отключает expire_shared_links_task. Если Redis недоступен,
+    ссылку отключит проверка в cleanup_files_task.
+
+    :param user_files: Файлы с новой ссылкой и shared_expiry
+    """
+    entries = {
+        str(user_file.shared_link): user_file.shared_expiry.timestamp()
+        for user_file in user_files
+        if user_file.shared_link and user_file.shared_expiry
+    }
+    if not entries:
+        return
+
+    def schedule():
+        try:
+            get_redis_connection('default').zadd(
+                cache.make_key(SHARED_LINK_EXPIRY_KEY),
+                entries
+            )
+        except NotImplementedError:
+            pass
+        except RedisError as e:
+            logger.warning(f"Shared link expiry not scheduled: {e}")
+
+    transaction.on_commit(schedule)
+
+
+@shared_task(name="storage.tasks.expire_shared_links_task")
+def expire_shared_links_task(batch_size=500):
+    """Отключение ссылок, срок которых наступил"""
+    redis = get_redis_connection('default')
+    key = cache.make_key(SHARED_LINK_EXPIRY_KEY)
+    now = timezone.now()
+    expired_count = 0
+
+    while True:
+        entries = redis.zrangebyscore(
+            key, '-inf', now.timestamp(), start=0, num=batch_size
+        )
+        if not entries:
+            break
+
+        # Ссылка могла быть снята или пересоздана после постановки
+        # в очередь: такие записи просто убираются из множества
+        with transaction.atomic():
+            expired_files = UserFile.objects.filter(
+                shared_link__in=[entry.decode() for entry in entries],
+                shared_expiry__lte=now
+            )
+            expired = list(
+                expired_files.select_for_update().values_list(
+                    'pk', 'user_id', 'shared_link'
+                )
+            )
+            expired_count += expired_files.update(
+                shared_link=None,
+                shared_expiry=None
+            )
+            expired_by_user = {}
+            for file_id, user_id, _ in expired:
+                expired_by_user.setdefault(user_id, []).append(file_id)
+            for user_id, file_ids in expired_by_user.items():
+                record_file_changes(FileChange.UPDATED, user_id, file_ids)
+
+        for user_id in expired_by_user:
+            bump_file_list_generation(user_id)
+        invalidate_shared_link(*(link for _, _, link in expired))
+        redis.zrem(key, *entries)
+
+        if len(entries) < batch_size:
+            break
+
+    result = {'shared_links_expired': expired_count}
+    logger.info(f"Shared links expired: {result}")
+    return result
+
+
+def purge_files(queryset, deadline):
+    """
+    Удаление файлов пачками, пока не выйдет время.
+
+    :param queryset: Файлы для удаления (UserFile.all_objects)
+    :param deadline: Момент (time.monotonic()), после которого
+    новая пачка не начинается
+    :return: Кортеж (удалено файлов, остались ли еще файлы)
+    """
+    purged_count = 0
+    while time.monotonic() < deadline:
+        file_ids = list(
+            queryset.order_by('pk').values_list(
+                'pk', flat=True
+            )[:settings.TRASH_PURGE_BATCH_SIZE]
+        )
+        if not file_ids:
+            return purged_count, False
+        purged_count += delete_files(file_ids)
+    return purged_count, True
+
+
+@shared_task(name="storage.tasks.purge_trash_task")
+def purge_trash_task():
+    """Окончательное удаление файлов, пролежавших в корзине TRASH_RETENTION"""
+    deadline = time.monotonic() + settings.TRASH_PURGE_TIME_BUDGET
+    purged_before = timezone.now() - timedelta(seconds=settings.TRASH_RETENTION)
+
+    purged_count, _ = purge_files(
+        UserFile.all_objects.filter(deleted_at__lt=purged_before),
+        deadline
+    )
+
+    result = {'trashed_files_purged': purged_count}
+    logger.info(f"Trash purged: {result}")
+    return result
+
+
+@shared_task(name="storage.tasks.purge_user_task")
+def purge_user_task(user_id):
+    """Удаление всех файлов пользователя, затем самого пользователя"""
+    deadline = time.monotonic() + settings.TRASH_PURGE_TIME_BUDGET
+    purged_count, remaining = purge_files(
+        UserFile.all_objects.filter(user_id=user_id),
+        deadline
+    )
+
+    if remaining:
+        # Не уложились во время — продолжаем следующей задачей
+        purge_user_task.delay(user_id)
+    else:
+        for session in UploadSession.objects.filter(user_id=user_id):
+            session.delete()
+        CustomUser.objects.filter(pk=user_id).delete()
+
+    result = {'user_files_purged': purged_count, 'user_deleted': not remaining}
+    logger.info(f"User {user_id} purged: {result}")
+    return result
+
+
+@shared_task(name="storage.tasks.prune_file_changes_task")
+def prune_file_changes_task(batch_size=5000):
+    """Удаление событий журнала изменений старше CHANGES_RETENTION"""
+    pruned_before = timezone.now() - timedelta(seconds=settings.CHANGES_RETENTION)
+    boundary = FileChange.objects.filter(
+        created_at__gte=pruned_before
+    ).order_by('id').values_list('id', flat=True).first()
+
+    # Самое новое событие не удаляется никогда: по нему (как по самому
+    # старому оставшемуся) определяется, что курсор клиента устарел
+    newest = FileChange.objects.order_by('-id').values_list(
+        'id',
+        flat=True
+    ).first()
+    if newest is None:
+        return {'file_changes_pruned': 0}
+
+    old_changes = FileChange.objects.filter(id__lt=newest)
+    if boundary is not None:
+        old_changes = old_changes.filter(id__lt=boundary)
+    else:
+        old_changes = old_changes.filter(created_at__lt=pruned_before)
+
+    pruned_count = 0
+    while True:
+        change_ids = list(
+            old_changes.order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if not change_ids:
+            break
+        pruned_count += FileChange.objects.filter(id__in=change_ids).delete()[0]
+
+    result = {'file_changes_pruned': pruned_count}
+    logger.info(f"File changes pruned: {result}")
+    return result
@@ -1,3 +1,6 @@
+import base64
+import json
+
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.urls import reverse
 from rest_framework import status
@@ -116,4 +119,71 @@ class FileAPITestCase(APITransactionTestCase):
         list_url = reverse('file-list') + f'?user_id={self.user.id}'
         response = self.client.get(list_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_file_list_pagination(self):
+        for size in (30, 10, 50, 20, 40):
+            UserFile.objects.create(
+                user=self.user,
+                original_name=f'file_{size}.txt',
+                file=None,
+                size=size
+            )
+
+        url = reverse('file-list') + '?ordering=size&page_size=2'
+        sizes = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data['results']), 2)
+            sizes += [item['size'] for item in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(sizes, [10, 20, 30, 40, 50])
+
+        response = self.client.get(reverse('file-list') + '?min_size=25&name=file_')
+        self.assertEqual(
+            sorted(item['size'] for item in response.data['results']),
+            [30, 40, 50]
+        )
+
+    def test_file_list_rejects_tampered_cursor(self):
+        for field, value in (('upload_date', 'garbage'), ('size', 'abc')):
+            cursor = base64.urlsafe_b64encode(json.dumps({
+                'field': field,
+                'value': value,
+                'id': 1
+            }).encode()).decode()
+            response = self.client.get(
+                reverse('file-list'),
+                {'ordering': field, 'cursor': cursor}
+            )
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_file_list_is_served_from_cache(self):
+        UserFile.objects.create(
+            user=self.user,
+            original_name='first.txt',
+            file=None,
+            size=10
+        )
+
+        url = reverse('file-list')
+        response = self.client.get(url)
+        etag = response['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(len(response.data['results']), 1)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        UserFile.objects.create(
+            user=self.user,
+            original_name='second.txt',
+            file=None,
+            size=20
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 2)
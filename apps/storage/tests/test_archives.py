@@ -0,0 +1,102 @@
+import io
+import os
+import zipfile
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from apps.accounts.models import CustomUser
+from apps.storage.models import UserFile
+
+
+class FileArchiveTestCase(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='archiver',
+            email='archiver@example.com',
+            full_name='Archive User',
+            password='testpass123'
+        )
+        self.other = CustomUser.objects.create_user(
+            username='stranger',
+            email='stranger@example.com',
+            full_name='Other User',
+            password='testpass123'
+        )
+        self.files = [
+            self.create_file(self.user, 'notes.txt', b'a' * 1000),
+            self.create_file(self.user, 'notes.txt', b'second'),
+            self.create_file(self.user, 'photo.jpg', b'\xff\xd8jpeg'),
+        ]
+        self.foreign = self.create_file(self.other, 'secret.txt', b'secret')
+        self.url = reverse('file-archive')
+        self.client.force_authenticate(user=self.user)
+
+    def tearDown(self):
+        for user_file in self.files + [self.foreign]:
+            user_file.delete()
+        cache.clear()
+
+    def create_file(self, user, name, content):
+        user_file = UserFile(
+            user=user,
+            file=SimpleUploadedFile(name, content),
+            size=len(content)
+        )
+        user_file.save()
+        return user_file
+
+    def ids(self, files):
+        return ','.join(str(user_file.pk) for user_file in files)
+
+    def test_archive_contains_files(self):
+        response = self.client.get(self.url, {'ids': self.ids(self.files)})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+
+        archive = zipfile.ZipFile(
+            io.BytesIO(b''.join(response.streaming_content))
+        )
+        self.assertIsNone(archive.testzip())
+        self.assertEqual(
+            archive.namelist(),
+            ['notes.txt', 'notes (1).txt', 'photo.jpg']
+        )
+        self.assertEqual(archive.read('notes.txt'), b'a' * 1000)
+        self.assertEqual(archive.read('notes (1).txt'), b'second')
+        self.assertEqual(
+            archive.getinfo('notes.txt').compress_type,
+            zipfile.ZIP_DEFLATED
+        )
+        self.assertEqual(
+            archive.getinfo('photo.jpg').compress_type,
+            zipfile.ZIP_STORED
+        )
+
+    def test_foreign_and_missing_files(self):
+        response = self.client.get(
+            self.url,
+            {'ids': self.ids([self.files[0], self.foreign])}
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        response = self.client.get(self.url, {'ids': '999999'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_file_missing_on_disk_is_left_out(self):
+        os.remove(self.files[1].file.path)
+
+        response = self.client.get(self.url, {'ids': self.ids(self.files)})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        archive = zipfile.ZipFile(
+            io.BytesIO(b''.join(response.streaming_content))
+        )
+        self.assertIsNone(archive.testzip())
+        self.assertEqual(archive.namelist(), ['notes.txt', 'photo.jpg'])
@@ -0,0 +1,217 @@
+import hashlib
+import os
+import uuid
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import transaction
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from apps.accounts.models import CustomUser
+from apps.storage.blobs import BLOB_STAGING_DIR, store_blob_from_path
+from apps.storage.models import Blob, UserFile
+
+
+class BlobDeduplicationTestCase(APITestCase):
+    def setUp(self):
+        self.first = CustomUser.objects.create_user(
+            username='firstuser',
+            email='first@example.com',
+            full_name='First User',
+            password='testpass123'
+        )
+        self.second = CustomUser.objects.create_user(
+            username='seconduser',
+            email='second@example.com',
+            full_name='Second User',
+            password='testpass123'
+        )
+
+    def tearDown(self):
+        for user_file in UserFile.objects.all():
+            user_file.delete()
+        cache.clear()
+
+    def upload(self, user, content):
+        self.client.force_authenticate(user=user)
+        upload = SimpleUploadedFile('installer.bin', content)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('file-list'),
+                {'file': upload},
+                format='multipart'
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return UserFile.objects.get(user=user)
+
+    def test_identical_uploads_share_one_blob(self):
+        content = b'the same installer for everyone'
+        first_file = self.upload(self.first, content)
+        second_file = self.upload(self.second, content)
+
+        blob = Blob.objects.get()
+        self.assertEqual(blob.ref_count, 2)
+        self.assertEqual(first_file.blob_id, blob.pk)
+        self.assertEqual(second_file.file.name, first_file.file.name)
+        self.assertEqual(first_file.original_name, 'installer.bin')
+        path = blob.file.path
+        self.assertTrue(os.path.exists(path))
+
+        first_file.delete()
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 1)
+        self.assertTrue(os.path.exists(path))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second_file.delete()
+        self.assertFalse(Blob.objects.exists())
+        self.assertFalse(os.path.exists(path))
+
+    def test_user_deletion_releases_blob(self):
+        content = b'content of a user about to be deleted'
+        self.upload(self.first, content)
+        self.upload(self.second, content)
+        blob = Blob.objects.get()
+        path = blob.file.path
+
+        self.second.delete()
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            CustomUser.objects.filter(pk=self.first.pk).delete()
+        self.assertFalse(Blob.objects.exists())
+        self.assertFalse(os.path.exists(path))
+
+    def test_failed_upload_releases_reservation(self):
+        storage = Blob._meta.get_field('file').storage
+        staging = storage.path(BLOB_STAGING_DIR)
+        os.makedirs(staging, exist_ok=True)
+        staged = set(os.listdir(staging))
+
+        self.client.force_authenticate(user=self.first)
+        with patch.object(UserFile, 'set_blob', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.client.post(
+                    reverse('file-list'),
+                    {'file': SimpleUploadedFile('broken.bin', b'never stored')},
+                    format='multipart'
+                )
+
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.storage_used, 0)
+        self.assertEqual(set(os.listdir(staging)), staged)
+        self.assertFalse(UserFile.objects.exists())
+
+    def instant_upload(self, content, proof_content=None):
+        url = reverse('file-instant-upload')
+        data = {
+            'original_name': 'backup.tar',
+            'sha256': hashlib.sha256(content).hexdigest(),
+            'size': len(content)
+        }
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        offset, length = response.data['offset'], response.data['length']
+        proof_content = content if proof_content is None else proof_content
+        return self.client.post(url, {
+            **data,
+            'challenge': response.data['challenge'],
+            'proof': hashlib.sha256(
+                proof_content[offset:offset + length]
+            ).hexdigest()
+        }, format='json')
+
+    @override_settings(INSTANT_UPLOAD_PROOF_LENGTH=4)
+    def test_instant_upload_of_stored_content(self):
+        content = b'a large backup archive'
+        self.upload(self.first, content)
+
+        self.client.force_authenticate(user=self.second)
+        response = self.instant_upload(content)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['original_name'], 'backup.tar')
+        self.assertEqual(Blob.objects.get().ref_count, 2)
+        self.second.refresh_from_db()
+        self.assertEqual(self.second.storage_used, len(content))
+
+    @override_settings(INSTANT_UPLOAD_PROOF_LENGTH=4)
+    def test_instant_upload_requires_the_content(self):
+        content = b'a private backup archive'
+        self.upload(self.first, content)
+
+        self.client.force_authenticate(user=self.second)
+        response = self.instant_upload(content, proof_content=b'x' * len(content))
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(Blob.objects.get().ref_count, 1)
+        self.assertFalse(UserFile.objects.filter(user=self.second).exists())
+        self.second.refresh_from_db()
+        self.assertEqual(self.second.storage_used, 0)
+
+    def test_instant_upload_of_unknown_content(self):
+        self.client.force_authenticate(user=self.second)
+        response = self.instant_upload(b'never uploaded')
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(UserFile.objects.exists())
+
+    def test_instant_upload_challenge_is_single_use(self):
+        content = b'uploaded once'
+        self.upload(self.first, content)
+
+        url = reverse('file-instant-upload')
+        data = {
+            'original_name': 'again.bin',
+            'sha256': hashlib.sha256(content).hexdigest(),
+            'size': len(content)
+        }
+        challenge = self.client.post(url, data, format='json').data
+        data.update(
+            challenge=challenge['challenge'],
+            proof=hashlib.sha256(content).hexdigest()
+        )
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class BlobCommitTestCase(APITestCase):
+    def setUp(self):
+        storage = Blob._meta.get_field('file').storage
+        self.content = uuid.uuid4().bytes
+        self.path = storage.path(f'incoming-{uuid.uuid4().hex}')
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, 'wb') as f:
+            f.write(self.content)
+
+    def tearDown(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def test_rollback_leaves_source_in_place(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError):
+                with transaction.atomic():
+                    store_blob_from_path(self.path, len(self.content))
+                    raise RuntimeError('the file row could not be created')
+
+        self.assertTrue(os.path.exists(self.path))
+        self.assertFalse(Blob.objects.exists())
+
+    def test_commit_moves_source_into_store(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            blob = store_blob_from_path(self.path, len(self.content))
+
+        self.assertFalse(os.path.exists(self.path))
+        with blob.file.open('rb') as f:
+            self.assertEqual(f.read(), self.content)
+        blob.file.delete(save=False)
@@ -0,0 +1,85 @@
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from apps.accounts.models import CustomUser
+from apps.storage.models import UserFile
+
+
+class FileBulkTestCase(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='bulker',
+            email='bulker@example.com',
+            full_name='Bulk User',
+            password='testpass123'
+        )
+        self.other = CustomUser.objects.create_user(
+            username='bystander',
+            email='bystander@example.com',
+            full_name='Other User',
+            password='testpass123'
+        )
+        self.files = [self.create_file(self.user, f'f{i}.txt') for i in range(4)]
+        self.foreign = self.create_file(self.other, 'foreign.txt')
+        self.url = reverse('file-bulk')
+        self.client.force_authenticate(user=self.user)
+
+    def tearDown(self):
+        for user_file in UserFile.all_objects.all():
+            user_file.delete()
+        cache.clear()
+
+    def create_file(self, user, name):
+        user_file = UserFile(
+            user=user,
+            file=SimpleUploadedFile(name, b'12345'),
+            size=5
+        )
+        user_file.save()
+        return user_file
+
+    def test_bulk_operations(self):
+        f0, f1, f2, f3 = self.files
+        old_link = f2.shared_link
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.url, {'operations': [
+                {'id': f0.pk, 'op': 'rename', 'original_name': 'renamed.txt'},
+                {'id': f0.pk, 'op': 'comment', 'comment': 'note'},
+                {'id': f1.pk, 'op': 'share', 'expiry_days': 3},
+                {'id': f2.pk, 'op': 'unshare'},
+                {'id': f3.pk, 'op': 'delete'},
+                {'id': f3.pk, 'op': 'comment', 'comment': 'too late'},
+                {'id': self.foreign.pk, 'op': 'delete'},
+            ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        statuses = [item['status'] for item in response.data['results']]
+        self.assertEqual(statuses, [200, 200, 200, 200, 200, 404, 404])
+
+        f0.refresh_from_db()
+        self.assertEqual((f0.original_name, f0.comment), ('renamed.txt', 'note'))
+        f1.refresh_from_db()
+        self.assertEqual(response.data['results'][2]['shared_link'], f1.shared_link)
+        self.assertIsNotNone(f1.shared_expiry)
+        f2.refresh_from_db()
+        self.assertIsNone(f2.shared_link)
+        self.assertFalse(UserFile.objects.filter(pk=f3.pk).exists())
+        self.assertTrue(UserFile.objects.filter(pk=self.foreign.pk).exists())
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.storage_used, 15)
+
+        response = self.client.get(
+            reverse('shared-file-download', kwargs={'shared_link': old_link})
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_invalid_operation(self):
+        response = self.client.post(self.url, {'operations': [
+            {'id': self.files[0].pk, 'op': 'rename'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
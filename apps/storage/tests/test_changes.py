@@ -0,0 +1,123 @@
+from django.core.cache import cache
+from datetime import timedelta
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from apps.accounts.models import CustomUser
+from apps.storage.models import FileChange, UserFile
+from apps.storage.tasks import prune_file_changes_task
+
+
+@override_settings(CHANGES_SAFETY_WINDOW=0)
+class FileChangesTestCase(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='syncer',
+            email='syncer@example.com',
+            full_name='Sync User',
+            password='testpass123'
+        )
+        self.url = reverse('file-changes')
+        self.client.force_authenticate(user=self.user)
+
+    def tearDown(self):
+        for user_file in UserFile.all_objects.all():
+            user_file.delete()
+        cache.clear()
+
+    def create_file(self, name):
+        user_file = UserFile(
+            user=self.user,
+            file=SimpleUploadedFile(name, b'12345'),
+            size=5
+        )
+        user_file.save()
+        return user_file
+
+    def test_changes_are_compacted_per_file(self):
+        kept = self.create_file('kept.txt')
+        cursor = self.client.get(self.url).data['cursor']
+
+        created = self.create_file('new.txt')
+        created.comment = 'edited'
+        created.save()
+        kept.comment = 'changed'
+        kept.save()
+        kept.trash()
+
+        response = self.client.get(self.url, {'since': cursor})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        changes = {change['id']: change for change in response.data['changes']}
+        self.assertEqual(set(changes), {created.pk, kept.pk})
+        self.assertEqual(changes[created.pk]['action'], FileChange.CREATED)
+        self.assertEqual(changes[created.pk]['file']['comment'], 'edited')
+        self.assertEqual(changes[kept.pk], {'id': kept.pk, 'action': 'deleted'})
+
+        response = self.client.get(self.url, {'since': response.data['cursor']})
+        self.assertEqual(response.data['changes'], [])
+        self.assertFalse(response.data['has_more'])
+
+    def test_other_users_changes_are_hidden(self):
+        cursor = self.client.get(self.url).data['cursor']
+        other = CustomUser.objects.create_user(
+            username='neighbour',
+            email='neighbour@example.com',
+            full_name='Other User',
+            password='testpass123'
+        )
+        UserFile(
+            user=other,
+            file=SimpleUploadedFile('theirs.txt', b'12345'),
+            size=5
+        ).save()
+
+        response = self.client.get(self.url, {'since': cursor})
+        self.assertEqual(response.data['changes'], [])
+
+    def test_pruned_cursor_is_gone(self):
+        self.create_file('a.txt')
+        self.create_file('b.txt')
+        FileChange.objects.order_by('id').first().delete()
+
+        response = self.client.get(self.url, {'since': 0})
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+
+    @override_settings(CHANGES_RETENTION=60)
+    def test_pruning_keeps_cursor_expiry(self):
+        self.create_file('a.txt')
+        self.create_file('b.txt')
+        FileChange.objects.update(created_at=timezone.now() - timedelta(hours=1))
+
+        result = prune_file_changes_task()
+        self.assertEqual(result['file_changes_pruned'], 1)
+        self.assertEqual(FileChange.objects.count(), 1)
+
+        response = self.client.get(self.url, {'since': 0})
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+
+    @override_settings(CHANGES_SAFETY_WINDOW=300)
+    def test_cursor_waits_for_recent_changes(self):
+        cursor = self.client.get(self.url).data['cursor']
+        created = self.create_file('late.txt')
+
+        # A change within the safety window is sent again on the next
+        # poll, in case an older transaction commits in the meantime
+        for _ in range(2):
+            response = self.client.get(self.url, {'since': cursor})
+            self.assertEqual(response.data['cursor'], cursor)
+            self.assertEqual(
+                [change['id'] for change in response.data['changes']],
+                [created.pk]
+            )
+
+        FileChange.objects.update(created_at=timezone.now() - timedelta(hours=1))
+        response = self.client.get(self.url, {'since': cursor})
+        self.assertEqual(len(response.data['changes']), 1)
+
+        response = self.client.get(self.url, {'since': response.data['cursor']})
+        self.assertEqual(response.data['changes'], [])
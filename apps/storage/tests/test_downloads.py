@@ -0,0 +1,259 @@
+import os
+import uuid
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from apps.accounts.models import CustomUser
+from apps.storage.models import UserFile
+from apps.storage.sharing import make_share_token
+
+
+class RangeDownloadTestCase(APITestCase):
+    content = b'0123456789abcdefghij'
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='downloader',
+            email='downloader@example.com',
+            full_name='Download User',
+            password='testpass123'
+        )
+        self.user_file = UserFile(
+            user=self.user,
+            file=SimpleUploadedFile('range.txt', self.content),
+            size=len(self.content)
+        )
+        self.user_file.save()
+        self.url = reverse('file-download', kwargs={'pk': self.user_file.pk})
+        self.client.force_authenticate(user=self.user)
+
+    def tearDown(self):
+        self.user_file.delete()
+        cache.clear()
+
+    def body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_full_download_advertises_ranges(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('ETag', response)
+        self.assertEqual(self.body(response), self.content)
+
+    @override_settings(DOWNLOAD_EVENTS_FLUSH_INTERVAL=0)
+    def test_download_updates_last_download(self):
+        self.client.get(self.url)
+        self.user_file.refresh_from_db()
+        self.assertIsNotNone(self.user_file.last_download)
+
+    def test_single_range(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=5-9')
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(response['Content-Range'], 'bytes 5-9/20')
+        self.assertEqual(self.body(response), b'56789')
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-3')
+        self.assertEqual(self.body(response), b'hij')
+
+    def test_multiple_ranges(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-1,18-')
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertTrue(
+            response['Content-Type'].startswith('multipart/byteranges')
+        )
+        body = self.body(response)
+        self.assertEqual(len(body), int(response['Content-Length']))
+        self.assertIn(b'Content-Range: bytes 0-1/20\r\n\r\n01', body)
+        self.assertIn(b'Content-Range: bytes 18-19/20\r\n\r\nij', body)
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=50-60')
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE
+        )
+        self.assertEqual(response['Content-Range'], 'bytes */20')
+
+    def test_conditional_requests(self):
+        etag = self.client.get(self.url)['ETag']
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        response = self.client.get(
+            self.url,
+            HTTP_RANGE='bytes=0-4',
+            HTTP_IF_RANGE='"stale-etag"'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.body(response), self.content)
+
+    @override_settings(
+        FILE_DELIVERY_BACKEND='x-accel-redirect',
+        FILE_DELIVERY_ACCEL_PREFIX='/protected/'
+    )
+    def test_download_offloaded_to_proxy(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response['X-Accel-Redirect'],
+            f'/protected/{self.user_file.file.name}'
+        )
+        self.assertIn('attachment', response['Content-Disposition'])
+        self.assertEqual(response.content, b'')
+
+
+class SharedLinkCacheTestCase(APITestCase):
+    content = b'shared content'
+
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(
+            username='sharer',
+            email='sharer@example.com',
+            full_name='Share User',
+            password='testpass123'
+        )
+        self.user_file = UserFile(
+            user=self.user,
+            file=SimpleUploadedFile('shared.txt', self.content),
+            size=len(self.content)
+        )
+        self.user_file.save()
+        self.url = reverse(
+            'shared-file-download',
+            kwargs={'shared_link': self.user_file.shared_link}
+        )
+
+    def tearDown(self):
+        self.user_file.delete()
+        cache.clear()
+
+    def select_count(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        selects = [
+            q for q in queries.captured_queries
+            if q['sql'].lstrip().upper().startswith('SELECT')
+        ]
+        return response, len(selects)
+
+    def test_repeated_download_skips_lookup(self):
+        response, selects = self.select_count(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(selects, 1)
+
+        response, selects = self.select_count(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(selects, 0)
+
+    def test_unknown_link_is_cached(self):
+        url = reverse(
+            'shared-file-download',
+            kwargs={'shared_link': uuid.uuid4()}
+        )
+        response, _ = self.select_count(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        response, selects = self.select_count(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(selects, 0)
+
+    def test_regenerated_link_invalidates_old_one(self):
+        self.client.get(self.url)
+
+        self.client.force_authenticate(user=self.user)
+        response = self.client.patch(
+            reverse('file-share', kwargs={'pk': self.user_file.pk}),
+            {}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.client.force_authenticate(user=None)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class SignedShareTestCase(APITestCase):
+    content = b'signed content'
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='signer',
+            email='signer@example.com',
+            full_name='Sign User',
+            password='testpass123'
+        )
+        self.user_file = UserFile(
+            user=self.user,
+            file=SimpleUploadedFile('signed.txt', self.content),
+            size=len(self.content)
+        )
+        self.user_file.save()
+        self.share_url = reverse(
+            'file-signed-share',
+            kwargs={'pk': self.user_file.pk}
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def tearDown(self):
+        self.user_file.delete()
+        cache.clear()
+
+    def download(self, token):
+        self.client.force_authenticate(user=None)
+        url = reverse('signed-file-download', kwargs={'token': token})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        return response, len(queries.captured_queries)
+
+    def test_signed_link_download(self):
+        response = self.client.post(self.share_url, {'expiry_days': 1})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIsNotNone(response.data['expires'])
+
+        response, _ = self.download(response.data['token'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+
+    def test_forged_and_expired_links_need_no_query(self):
+        token = make_share_token(self.user_file)
+        response, queries = self.download(token + 'x')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(queries, 0)
+
+        token = make_share_token(
+            self.user_file,
+            timezone.now() - timedelta(minutes=1)
+        )
+        response, queries = self.download(token)
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+        self.assertEqual(queries, 0)
+
+    def test_revoked_links_are_rejected(self):
+        token = self.client.post(self.share_url).data['token']
+
+        response = self.client.delete(self.share_url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        response, _ = self.download(token)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_missing_content_is_not_found(self):
+        token = make_share_token(self.user_file)
+        os.remove(self.user_file.file.path)
+
+        response, _ = self.download(token)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(response.data['detail'], 'File not found')
@@ -0,0 +1,111 @@
+import io
+import json
+import os
+import tarfile
+import tempfile
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from apps.accounts.models import CustomUser
+from apps.storage.models import UserFile
+
+
+class UserExportTestCase(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='leaving',
+            email='leaving@example.com',
+            full_name='Leaving User',
+            password='testpass123'
+        )
+        self.admin = CustomUser.objects.create_superuser(
+            username='exporter',
+            email='exporter@example.com',
+            full_name='Admin User',
+            password='testpass123'
+        )
+        self.files = []
+        for name, content in [
+            ('a.txt', b'first'),
+            ('a.txt', b'second'),
+            ('отчёт.pdf', b'%PDF' + b'x' * 700),
+        ]:
+            user_file = UserFile(
+                user=self.user,
+                file=SimpleUploadedFile(name, content),
+                size=len(content)
+            )
+            user_file.save()
+            self.files.append(user_file)
+        self.url = reverse('user-export', kwargs={'user_id': self.user.pk})
+
+    def tearDown(self):
+        for user_file in self.files:
+            user_file.delete()
+        cache.clear()
+
+    def assert_archive(self, data):
+        archive = tarfile.open(fileobj=io.BytesIO(data))
+        self.assertEqual(
+            archive.getnames(),
+            [
+                'files/a.txt',
+                'files/a (1).txt',
+                'files/отчёт.pdf',
+                'manifest.json'
+            ]
+        )
+        self.assertEqual(archive.extractfile('files/a (1).txt').read(), b'second')
+        manifest = json.load(archive.extractfile('manifest.json'))
+        self.assertEqual(
+            [entry['id'] for entry in manifest],
+            [user_file.pk for user_file in self.files]
+        )
+        self.assertEqual(manifest[2]['original_name'], 'отчёт.pdf')
+        self.assertEqual(manifest[2]['size'], 704)
+
+    def test_export_endpoint(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/x-tar')
+        self.assert_archive(b''.join(response.streaming_content))
+
+    def test_export_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'export.tar')
+            call_command(
+                'export_user_files',
+                self.user.username,
+                output=output,
+                stderr=io.StringIO()
+            )
+            with open(output, 'rb') as f:
+                self.assert_archive(f.read())
+
+    def test_file_missing_on_disk_is_listed_in_manifest(self):
+        os.remove(self.files[1].file.path)
+
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get(self.url)
+        archive = tarfile.open(
+            fileobj=io.BytesIO(b''.join(response.streaming_content))
+        )
+        self.assertEqual(
+            archive.getnames(),
+            ['files/a.txt', 'files/отчёт.pdf', 'manifest.json']
+        )
+        manifest = json.load(archive.extractfile('manifest.json'))
+        self.assertEqual(len(manifest), 3)
+        self.assertTrue(manifest[1]['missing'])
+        self.assertIsNone(manifest[1]['path'])
+        self.assertNotIn('missing', manifest[0])
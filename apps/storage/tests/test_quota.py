@@ -2,7 +2,10 @@ from apps.accounts.models import CustomUser
 from apps.storage.models import UserFile
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import TestCase
+from django.test import RequestFactory, TestCase
+from rest_framework.exceptions import ValidationError
+
+from apps.storage.uploadhandlers import QuotaUploadHandler
 
 
 class StorageQuotaTest(TestCase):
@@ -16,6 +19,9 @@ class StorageQuotaTest(TestCase):
         max_storage=10 * 1024 * 1024 # 10MB
     )
 
+    def setUp(self):
+        cache.clear()
+
     def test_quota_check(self):
         # Создаем файл размером 5MB
         file_5mb = SimpleUploadedFile(
@@ -55,3 +61,26 @@ class StorageQuotaTest(TestCase):
         )
         can_store_4_9mb = self.user.has_storage_space(file_4_9mb.size)
         self.assertTrue(can_store_4_9mb)
+
+    def test_upload_handler_rejects_by_content_length(self):
+        request = RequestFactory().post('/api/storage/files/')
+        request.user = self.user
+        handler = QuotaUploadHandler(request)
+
+        # Nothing of the body has been read at this point
+        with self.assertRaises(ValidationError):
+            handler.handle_raw_input(
+                None, request.META, 11 * 1024 * 1024, b'boundary'
+            )
+
+    def test_upload_handler_stops_when_quota_is_crossed(self):
+        request = RequestFactory().post('/api/storage/files/')
+        request.user = self.user
+        handler = QuotaUploadHandler(request)
+        handler.handle_raw_input(None, request.META, 1024, b'boundary')
+
+        chunk = b'x' * 4 * 1024 * 1024
+        self.assertEqual(handler.receive_data_chunk(chunk, 0), chunk)
+        self.assertEqual(handler.receive_data_chunk(chunk, len(chunk)), chunk)
+        with self.assertRaises(ValidationError):
+            handler.receive_data_chunk(chunk, 2 * len(chunk))
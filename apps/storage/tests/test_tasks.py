@@ -0,0 +1,275 @@
+import os
+import shutil
+import time
+from datetime import timedelta
+from unittest.mock import patch
+
+import fakeredis
+from freezegun import freeze_time
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from apps.accounts.models import CustomUser
+from apps.storage.models import Blob, UserFile
+from apps.storage.sweeper import purge_quarantine, sweep_storage
+from apps.storage.tasks import (
+    CLEANUP_CURSOR_KEY,
+    SHARED_LINK_EXPIRY_KEY,
+    cleanup_files_task,
+    cleanup_missing_files,
+    expire_shared_links_task,
+)
+
+
+@override_settings(CLEANUP_BATCH_SIZE=2)
+class CleanupMissingFilesTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(
+            username='cleaner',
+            email='cleaner@example.com',
+            full_name='Cleanup User',
+            password='testpass123'
+        )
+        self.files = []
+        for i in range(5):
+            user_file = UserFile(
+                user=self.user,
+                file=SimpleUploadedFile(f'file{i}.txt', b'12345'),
+                size=5
+            )
+            user_file.save()
+            self.files.append(user_file)
+
+    def tearDown(self):
+        for user_file in UserFile.objects.filter(user=self.user):
+            user_file.delete()
+        cache.clear()
+
+    def test_missing_files_are_deleted_in_bulk(self):
+        for user_file in self.files[1:3]:
+            os.remove(user_file.file.path)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            result = cleanup_files_task()
+
+        self.assertEqual(result['files_checked'], 5)
+        self.assertEqual(result['orphaned_files_deleted'], 2)
+        self.assertEqual(
+            set(UserFile.objects.values_list('pk', flat=True)),
+            {self.files[0].pk, self.files[3].pk, self.files[4].pk}
+        )
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.storage_used, 15)
+        # A full pass resets the cursor
+        self.assertEqual(cache.get(CLEANUP_CURSOR_KEY), 0)
+
+    def test_scan_resumes_from_cursor(self):
+        os.remove(self.files[4].file.path)
+        cache.set(CLEANUP_CURSOR_KEY, self.files[2].pk)
+
+        checked, deleted = cleanup_missing_files(time.monotonic() + 60)
+        self.assertEqual((checked, deleted), (2, 1))
+
+        # No time left: nothing is checked and the cursor is kept
+        cache.set(CLEANUP_CURSOR_KEY, self.files[1].pk)
+        checked, deleted = cleanup_missing_files(time.monotonic() - 1)
+        self.assertEqual((checked, deleted), (0, 0))
+        self.assertEqual(cache.get(CLEANUP_CURSOR_KEY), self.files[1].pk)
+
+
+class SweepStorageTestCase(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='sweeper',
+            email='sweeper@example.com',
+            full_name='Sweep User',
+            password='testpass123'
+        )
+        self.user_file = UserFile(
+            user=self.user,
+            file=SimpleUploadedFile('kept.txt', b'kept'),
+            size=4
+        )
+        self.user_file.save()
+
+        self.directory = os.path.dirname(self.user_file.file.path)
+        self.stray = os.path.join(self.directory, 'stray.bin')
+        with open(self.stray, 'wb') as f:
+            f.write(b'left behind')
+        self.storage_root = UserFile._meta.get_field('file').storage.location
+
+    def tearDown(self):
+        self.user_file.delete()
+        if os.path.exists(self.stray):
+            os.remove(self.stray)
+        shutil.rmtree(
+            os.path.join(self.storage_root, 'quarantine'),
+            ignore_errors=True
+        )
+        cache.clear()
+
+    def test_dry_run_reports_only(self):
+        reported = []
+        result = sweep_storage(
+            'report',
+            grace_period=0,
+            report=lambda name, size: reported.append((name, size))
+        )
+        name = f'{os.path.basename(self.directory)}/stray.bin'
+        self.assertIn((name, 11), reported)
+        self.assertNotIn(self.user_file.file.name, [n for n, _ in reported])
+        self.assertGreaterEqual(result['unreferenced_files'], 1)
+        self.assertTrue(os.path.exists(self.stray))
+
+    def test_quarantine_and_grace_period(self):
+        sweep_storage('quarantine', grace_period=3600)
+        self.assertTrue(os.path.exists(self.stray))
+
+        sweep_storage('quarantine', grace_period=0)
+        self.assertFalse(os.path.exists(self.stray))
+        self.assertTrue(os.path.exists(self.user_file.file.path))
+        self.assertTrue(os.path.exists(os.path.join(
+            self.storage_root,
+            'quarantine',
+            os.path.basename(self.directory),
+            'stray.bin'
+        )))
+
+    def test_orphaned_blobs_are_swept(self):
+        blob = Blob.objects.create(sha256='a' * 64, size=4)
+        blob.file.save(blob.sha256, SimpleUploadedFile('kept', b'kept'))
+        orphan = os.path.join(self.storage_root, 'blobs', 'bb', 'bb', 'b' * 64)
+        os.makedirs(os.path.dirname(orphan), exist_ok=True)
+        with open(orphan, 'wb') as f:
+            f.write(b'orphan')
+
+        reported = []
+        sweep_storage(
+            'delete',
+            grace_period=0,
+            report=lambda name, size: reported.append(name)
+        )
+        self.assertIn(f'blobs/bb/bb/{"b" * 64}', reported)
+        self.assertNotIn(blob.file.name, reported)
+        self.assertFalse(os.path.exists(orphan))
+        self.assertTrue(os.path.exists(blob.file.path))
+        blob.file.delete(save=False)
+
+    def test_quarantine_is_purged_after_retention(self):
+        sweep_storage('quarantine', grace_period=0)
+        quarantined = os.path.join(
+            self.storage_root,
+            'quarantine',
+            os.path.basename(self.directory),
+            'stray.bin'
+        )
+        self.assertEqual(purge_quarantine(retention=3600)['purged_files'], 0)
+        self.assertTrue(os.path.exists(quarantined))
+
+        old = time.time() - 7200
+        os.utime(quarantined, (old, old))
+        result = purge_quarantine(retention=3600)
+        self.assertGreaterEqual(result['purged_files'], 1)
+        self.assertFalse(os.path.exists(quarantined))
+        self.assertFalse(os.path.exists(os.path.dirname(quarantined)))
+
+
+class ShareLinkExpiryTestCase(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='expiring',
+            email='expiring@example.com',
+            full_name='Expiry User',
+            password='testpass123'
+        )
+        self.user_file = UserFile(
+            user=self.user,
+            file=SimpleUploadedFile('expiring.txt', b'soon gone'),
+            size=9
+        )
+        self.user_file.save()
+        self.url = reverse('file-share', kwargs={'pk': self.user_file.pk})
+        self.client.force_authenticate(user=self.user)
+        self.redis = fakeredis.FakeRedis()
+
+    def tearDown(self):
+        self.user_file.delete()
+        cache.clear()
+
+    def test_share_schedules_expiry(self):
+        with patch(
+            'apps.storage.tasks.get_redis_connection',
+            return_value=self.redis
+        ):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.patch(self.url, {'expiry_days': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.user_file.refresh_from_db()
+        self.assertIsNotNone(self.user_file.shared_expiry)
+        self.assertEqual(
+            self.redis.zscore(
+                cache.make_key(SHARED_LINK_EXPIRY_KEY),
+                str(self.user_file.shared_link)
+            ),
+            self.user_file.shared_expiry.timestamp()
+        )
+
+    def test_expiry_task_clears_only_expired_links(self):
+        with patch(
+            'apps.storage.tasks.get_redis_connection',
+            return_value=self.redis
+        ):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.patch(self.url, {'expiry_days': 1})
+            self.user_file.refresh_from_db()
+            link = self.user_file.shared_link
+
+            result = expire_shared_links_task()
+            self.assertEqual(result['shared_links_expired'], 0)
+            self.user_file.refresh_from_db()
+            self.assertEqual(self.user_file.shared_link, link)
+
+            with freeze_time(timezone.now() + timedelta(days=1, seconds=1)):
+                result = expire_shared_links_task(batch_size=1)
+        self.assertEqual(result['shared_links_expired'], 1)
+        self.user_file.refresh_from_db()
+        self.assertIsNone(self.user_file.shared_link)
+        self.assertIsNone(self.user_file.shared_expiry)
+        self.assertEqual(
+            self.redis.zcard(cache.make_key(SHARED_LINK_EXPIRY_KEY)), 0
+        )
+
+    def test_expiry_task_skips_replaced_link(self):
+        with patch(
+            'apps.storage.tasks.get_redis_connection',
+            return_value=self.redis
+        ):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.patch(self.url, {'expiry_days': 1})
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.patch(self.url, {'expiry_days': 30})
+            self.user_file.refresh_from_db()
+            link = self.user_file.shared_link
+
+            with freeze_time(timezone.now() + timedelta(days=2)):
+                result = expire_shared_links_task()
+        self.assertEqual(result['shared_links_expired'], 0)
+        self.user_file.refresh_from_db()
+        self.assertEqual(self.user_file.shared_link, link)
+        self.assertEqual(
+            self.redis.zcard(cache.make_key(SHARED_LINK_EXPIRY_KEY)), 1
+        )
+
+    def test_unshare(self):
+        response = self.client.delete(self.url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.user_file.refresh_from_db()
+        self.assertIsNone(self.user_file.shared_link)
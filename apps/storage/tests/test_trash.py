@@ -0,0 +1,155 @@
+import os
+from unittest.mock import patch
+
+from django.contrib import admin
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from apps.accounts.models import CustomUser
+from apps.storage.models import UserFile
+from apps.storage.tasks import purge_trash_task
+
+
+class TrashTestCase(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='trasher',
+            email='trasher@example.com',
+            full_name='Trash User',
+            password='testpass123'
+        )
+        self.user_file = UserFile(
+            user=self.user,
+            file=SimpleUploadedFile('trashed.txt', b'0123456789'),
+            size=10
+        )
+        self.user_file.save()
+        self.path = self.user_file.file.path
+        self.client.force_authenticate(user=self.user)
+
+    def tearDown(self):
+        for user_file in UserFile.all_objects.all():
+            user_file.delete()
+        cache.clear()
+
+    def test_delete_moves_file_to_trash(self):
+        response = self.client.delete(
+            reverse('file-detail', kwargs={'pk': self.user_file.pk})
+        )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.storage_used, 0)
+        self.assertTrue(os.path.exists(self.path))
+        self.assertFalse(UserFile.objects.filter(pk=self.user_file.pk).exists())
+
+        response = self.client.get(reverse('file-trash'))
+        self.assertEqual(
+            [item['id'] for item in response.data['results']],
+            [self.user_file.pk]
+        )
+
+        response = self.client.post(
+            reverse('file-restore', kwargs={'pk': self.user_file.pk})
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(response.data['deleted_at'])
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.storage_used, 10)
+
+    def test_restore_respects_quota(self):
+        self.user_file.trash()
+        CustomUser.objects.filter(pk=self.user.pk).update(max_storage=5)
+
+        response = self.client.post(
+            reverse('file-restore', kwargs={'pk': self.user_file.pk})
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(TRASH_RETENTION=0)
+    def test_purge_removes_trashed_files(self):
+        self.user_file.trash()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            result = purge_trash_task()
+
+        self.assertEqual(result['trashed_files_purged'], 1)
+        self.assertFalse(UserFile.all_objects.exists())
+        self.assertFalse(os.path.exists(self.path))
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.storage_used, 0)
+
+    def test_user_deletion_runs_in_background(self):
+        admin = CustomUser.objects.create_superuser(
+            username='remover',
+            email='remover@example.com',
+            full_name='Admin User',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=admin)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(
+                reverse('user-detail', kwargs={'pk': self.user.pk})
+            )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        self.assertFalse(CustomUser.objects.filter(pk=self.user.pk).exists())
+        self.assertFalse(UserFile.all_objects.exists())
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_user_deletion_invalidates_shared_links(self):
+        admin = CustomUser.objects.create_superuser(
+            username='remover',
+            email='remover@example.com',
+            full_name='Admin User',
+            password='testpass123'
+        )
+        shared_url = reverse(
+            'shared-file-download',
+            kwargs={'shared_link': self.user_file.shared_link}
+        )
+        response = self.client.get(shared_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.client.force_authenticate(user=admin)
+        with patch('apps.storage.tasks.purge_user_task.delay') as purge:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.delete(
+                    reverse('user-detail', kwargs={'pk': self.user.pk})
+                )
+        purge.assert_called_once_with(self.user.pk)
+
+        response = self.client.get(shared_url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_admin_file_deletion_releases_storage(self):
+        model_admin = admin.site._registry[UserFile]
+        model_admin.delete_queryset(
+            None,
+            model_admin.get_queryset(None).filter(pk=self.user_file.pk)
+        )
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.storage_used, 0)
+        self.assertFalse(UserFile.all_objects.exists())
+
+    def test_admin_user_deletion_runs_in_background(self):
+        model_admin = admin.site._registry[CustomUser]
+
+        with patch('apps.storage.tasks.purge_user_task.delay') as purge:
+            with self.captureOnCommitCallbacks(execute=True):
+                model_admin.delete_queryset(
+                    None,
+                    CustomUser.objects.filter(pk=self.user.pk)
+                )
+        purge.assert_called_once_with(self.user.pk)
+
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        self.assertFalse(UserFile.objects.exists())
+        self.assertTrue(UserFile.all_objects.exists())
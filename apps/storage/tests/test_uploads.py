@@ -0,0 +1,149 @@
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from apps.accounts.models import CustomUser
+from apps.storage.models import UploadSession, UserFile
+from apps.storage.tasks import cleanup_files_task
+from apps.storage.views import UPLOAD_WRITER_KEY
+
+
+class UploadSessionAPITestCase(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='uploader',
+            email='uploader@example.com',
+            full_name='Upload User',
+            password='testpass123',
+            max_storage=100 * 1024 * 1024
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def tearDown(self):
+        for user_file in UserFile.objects.all():
+            user_file.delete()
+        for session in UploadSession.objects.all():
+            session.delete()
+        cache.clear()
+
+    def put_chunk(self, session_id, data, start, total):
+        url = reverse('upload-session-detail', kwargs={'pk': session_id})
+        return self.client.put(
+            url,
+            data=data,
+            content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=f'bytes {start}-{start + len(data) - 1}/{total}'
+        )
+
+    def test_resumable_upload(self):
+        content = b'hello world'
+        response = self.client.post(
+            reverse('upload-session-list'),
+            {'original_name': 'hello.txt', 'size': len(content)},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        session_id = response.data['id']
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.storage_used, len(content))
+
+        response = self.put_chunk(session_id, content[:6], 0, len(content))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # Resuming requires asking the server for the current offset
+        url = reverse('upload-session-detail', kwargs={'pk': session_id})
+        response = self.client.get(url)
+        self.assertEqual(response.data['offset'], 6)
+
+        response = self.put_chunk(session_id, content[:6], 0, len(content))
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+        complete_url = reverse(
+            'upload-session-complete',
+            kwargs={'pk': session_id}
+        )
+        response = self.client.post(complete_url)
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+        response = self.put_chunk(session_id, content[6:], 6, len(content))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(complete_url)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['original_name'], 'hello.txt')
+
+        user_file = UserFile.objects.get(pk=response.data['id'])
+        with user_file.file.open('rb') as f:
+            self.assertEqual(f.read(), content)
+        self.assertFalse(UploadSession.objects.exists())
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.storage_used, len(content))
+
+    def test_session_reserves_storage_until_deleted(self):
+        response = self.client.post(
+            reverse('upload-session-list'),
+            {'original_name': 'half.iso', 'size': self.user.max_storage},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        session_id = response.data['id']
+
+        response = self.client.post(
+            reverse('upload-session-list'),
+            {'original_name': 'other.iso', 'size': 1},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.delete(
+            reverse('upload-session-detail', kwargs={'pk': session_id})
+        )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.storage_used, 0)
+
+    @override_settings(UPLOAD_SESSION_TTL=0)
+    def test_abandoned_session_releases_storage(self):
+        self.client.post(
+            reverse('upload-session-list'),
+            {'original_name': 'left.bin', 'size': 1024},
+            format='json'
+        )
+
+        result = cleanup_files_task()
+        self.assertEqual(result['abandoned_uploads_deleted'], 1)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.storage_used, 0)
+
+    def test_concurrent_chunk_is_rejected(self):
+        content = b'hello world'
+        response = self.client.post(
+            reverse('upload-session-list'),
+            {'original_name': 'hello.txt', 'size': len(content)},
+            format='json'
+        )
+        session_id = response.data['id']
+
+        claim = UPLOAD_WRITER_KEY.format(session_id)
+        cache.add(claim, 1)
+        response = self.put_chunk(session_id, content, 0, len(content))
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(UploadSession.objects.get(pk=session_id).offset, 0)
+
+        cache.delete(claim)
+        response = self.put_chunk(session_id, content, 0, len(content))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['offset'], len(content))
+        self.assertIsNone(cache.get(claim))
+
+    def test_session_over_quota_is_rejected(self):
+        response = self.client.post(
+            reverse('upload-session-list'),
+            {'original_name': 'big.iso', 'size': self.user.max_storage + 1},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(UploadSession.objects.exists())
@@ -0,0 +1,110 @@
+import hashlib
+
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler
+from rest_framework import serializers
+
+QUOTA_EXCEEDED_ERROR = (
+    "You have exceeded the maximum storage limit. "
+    "Please contact the administrator at admin@mail.ru "
+    "to increase your storage quota"
+)
+
+
+class QuotaUploadHandler(FileUploadHandler):
+    """
+    Abort a multipart upload as soon as it can no
+    longer fit into the user's storage quota.
+
+    The handler must be the first one in request.upload_handlers.
+    It only counts bytes and hands every chunk over to the next
+    handler, so the body is never buffered or written to disk
+    past the point where the quota is exceeded.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.remaining = None
+        self.received = 0
+
+    def get_user(self):
+        """
+        Return the user the upload is charged to.
+
+        Token-authenticated requests are parsed by the view, after
+        DRF has set request._user. Session-authenticated requests
+        are parsed earlier, during the CSRF check, where only the
+        user set by AuthenticationMiddleware is available.
+
+        :return: The user object, or None if it is not known.
+        """
+        user = getattr(self.request, '_user', None)
+        if user is None:
+            django_request = getattr(self.request, '_request', self.request)
+            user = getattr(django_request, 'user', None)
+        return user
+
+    def handle_raw_input(self, input_data, META, content_length,
+                         boundary, encoding=None):
+        """
+        Reject the upload by its Content-Length before
+        reading any of the body.
+        """
+        user = self.get_user()
+        if user is None or not user.is_authenticated:
+            return
+
+        self.remaining = user.max_storage - user.get_storage_usage()
+        overhead = settings.UPLOAD_MULTIPART_OVERHEAD
+        if content_length - overhead > self.remaining:
+            self.quota_exceeded()
+
+    def receive_data_chunk(self, raw_data, start):
+        """
+        Count the received file bytes and stop the upload
+        once they no longer fit into the quota.
+        """
+        self.received += len(raw_data)
+        if self.remaining is not None and self.received > self.remaining:
+            self.quota_exceeded()
+        return raw_data
+
+    def file_complete(self, file_size):
+        return None
+
+    def quota_exceeded(self):
+        """
+        Abort the request with the same error
+        the view reports for over-quota uploads.
+        """
+        raise serializers.ValidationError({
+            'error': QUOTA_EXCEEDED_ERROR
+        })
+
+
+class ContentHashUploadHandler(FileUploadHandler):
+    """
+    Calculate the SHA-256 digest of every uploaded
+    file while its chunks stream through.
+
+    Like QuotaUploadHandler it passes the chunks on to the
+    next handler, which builds the actual uploaded file.
+    Digests are kept by form field name in self.hashes.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.hashes = {}
+        self.hasher = None
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.hasher = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.hasher.update(raw_data)
+        return raw_data
+
+    def file_complete(self, file_size):
+        self.hashes[self.field_name] = self.hasher.hexdigest()
+        return None
@@ -1,11 +1,23 @@
 from django.urls import path
 
 from .views import (
+    FileArchiveView,
+    FileBulkView,
+    FileChangesView,
     FileDetailView,
     FileDownloadView,
+    FileInstantUploadView,
     FileListView,
+    FileRestoreView,
     FileShareView,
+    FileSignedShareView,
+    FileTrashListView,
     SharedFileDownloadView,
+    SignedFileDownloadView,
+    UploadSessionCompleteView,
+    UploadSessionDetailView,
+    UploadSessionListView,
+    UserExportView,
 )
 
 urlpatterns = [
@@ -14,6 +26,31 @@ urlpatterns = [
         FileListView.as_view(),
         name='file-list'
     ),
+    path(
+        'files/instant/',
+        FileInstantUploadView.as_view(),
+        name='file-instant-upload'
+    ),
+    path(
+        'files/archive/',
+        FileArchiveView.as_view(),
+        name='file-archive'
+    ),
+    path(
+        'files/bulk/',
+        FileBulkView.as_view(),
+        name='file-bulk'
+    ),
+    path(
+        'files/changes/',
+        FileChangesView.as_view(),
+        name='file-changes'
+    ),
+    path(
+        'files/trash/',
+        FileTrashListView.as_view(),
+        name='file-trash'
+    ),
     path(
         'files/<int:pk>/',
         FileDetailView.as_view(),
@@ -24,14 +61,49 @@ urlpatterns = [
         FileDownloadView.as_view(),
         name='file-download'
     ),
+    path(
+        'files/<int:pk>/restore/',
+        FileRestoreView.as_view(),
+        name='file-restore'
+    ),
     path(
         'files/<int:pk>/share/',
         FileShareView.as_view(),
         name='file-share'
     ),
+    path(
+        'files/<int:pk>/share/signed/',
+        FileSignedShareView.as_view(),
+        name='file-signed-share'
+    ),
+    path(
+        'shared/signed/<str:token>/',
+        SignedFileDownloadView.as_view(),
+        name='signed-file-download'
+    ),
     path(
         'shared/<uuid:shared_link>/',
         SharedFileDownloadView.as_view(),
         name='shared-file-download'
     ),
+    path(
+        'users/<int:user_id>/export/',
+        UserExportView.as_view(),
+        name='user-export'
+    ),
+    path(
+        'uploads/',
+        UploadSessionListView.as_view(),
+        name='upload-session-list'
+    ),
+    path(
+        'uploads/<uuid:pk>/',
+        UploadSessionDetailView.as_view(),
+        name='upload-session-detail'
+    ),
+    path(
+        'uploads/<uuid:pk>/complete/',
+        UploadSessionCompleteView.as_view(),
+        name='upload-session-complete'
+    ),
 ]
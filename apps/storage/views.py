@@ -1,12 +1,21 @@
+import hashlib
+import mimetypes
+import re
 import uuid
 from datetime import timedelta
 
+from django.conf import settings
+from django.core import signing
 from django.core.cache import cache
-from django.core.exceptions import PermissionDenied
-from django.db.models import Prefetch
-from django.http import FileResponse, Http404
+from django.core.exceptions import ImproperlyConfigured, PermissionDenied
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import F, Prefetch
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from django.utils import timezone
+from django.utils.http import content_disposition_header
 from rest_framework import generics, permissions, serializers, status
 from rest_framework.decorators import action
 from rest_framework.parsers import MultiPartParser
@@ -15,97 +24,345 @@ from rest_framework.response import Response
 from apps.accounts.models import CustomUser
 from mycloud.settings.base import CACHE_TTL
 
-from .models import UserFile
+from .archives import iter_tar, iter_zip, user_export_files
+from .blobs import (
+    create_possession_challenge,
+    discard_file,
+    hash_path,
+    reference_blob,
+    stage_file,
+    store_blob_from_path,
+)
+from .caching import (
+    bump_file_list_generation,
+    file_list_generation,
+    invalidate_shared_link,
+)
+from .downloads import record_download, resolve_shared_link, serve_file
+from .models import (
+    FileChange,
+    UploadSession,
+    UserFile,
+    record_file_changes,
+    trash_files,
+)
+from .pagination import FileCursorPagination
 from .renderers.binary_file import BinaryFileRenderer
-from .serializers import FileSerializer, FileShareSerializer
+from .serializers import (
+    ArchiveRequestSerializer,
+    BulkRequestSerializer,
+    ExportRequestSerializer,
+    FileSerializer,
+    FileShareSerializer,
+    InstantUploadSerializer,
+    SignedShareSerializer,
+    UploadSessionSerializer,
+)
+from .sharing import make_share_token, read_share_token
+from .tasks import schedule_shared_link_expiry
+from .uploadhandlers import (
+    QUOTA_EXCEEDED_ERROR,
+    ContentHashUploadHandler,
+    QuotaUploadHandler,
+)
+
+CONTENT_RANGE_RE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+UPLOAD_WRITER_KEY = 'upload_session_writer_{}'
+INSTANT_UPLOAD_CHALLENGE_KEY = 'instant_upload_challenge_{}_{}'
 
 
 class FileListView(generics.ListCreateAPIView):
     serializer_class = FileSerializer
     permission_classes = [permissions.IsAuthenticated]
     parser_classes = [MultiPartParser]
+    pagination_class = FileCursorPagination
 
-    def get_cache_key(self):
+    def get_target_user_id(self):
+        """
+        Return the id of the user whose files are listed.
+
+        Superusers can list the files of any user
+        with the user_id query parameter.
+        """
         user = self.request.user
-        user_id = user.id
         if user.is_superuser and 'user_id' in self.request.query_params:
-            user_id = self.request.query_params['user_id']
-        return f'user_files_{user_id}'
+            try:
+                return int(self.request.query_params['user_id'])
+            except ValueError:
+                raise Http404("User not found")
+        return user.id
+
+    def get_cache_key(self):
+        """
+        Return the cache key and ETag of the requested page.
+
+        Both contain the generation of the user's file list,
+        which every change to the user's files bumps, and a
+        digest of the request URL (page, ordering and filters).
+        """
+        user_id = self.get_target_user_id()
+        generation = file_list_generation(user_id)
+        digest = hashlib.md5(
+            self.request.build_absolute_uri().encode()
+        ).hexdigest()
+        cache_key = f'user_files_{user_id}_{generation}_{digest}'
+        etag = f'"files-{user_id}-{generation}-{digest}"'
+        return cache_key, etag
+
+    def initial(self, request, *args, **kwargs):
+        """
+        Put the quota check and content hashing in front of
+        the upload handlers before any of the request body is read.
+        """
+        if request.method == 'POST':
+            request.upload_handlers[:0] = [
+                QuotaUploadHandler(request),
+                ContentHashUploadHandler(request),
+            ]
+        super().initial(request, *args, **kwargs)
+
+    def get_content_hash(self, field_name):
+        """
+        Return the SHA-256 digest calculated while the
+        given file field was uploaded, if there is one.
+        """
+        for handler in self.request.upload_handlers:
+            if isinstance(handler, ContentHashUploadHandler):
+                return handler.hashes.get(field_name)
+        return None
 
     def get_queryset(self):
         """
-        Returns a queryset of UserFile objects with caching and optimized queries
+        Returns a queryset of UserFile objects with optimized queries
         """
-        cache_key = self.get_cache_key()
-        queryset = cache.get(cache_key)
-        
-        if queryset is None:
-            user = self.request.user
+        user = self.request.user
 
-            if user.is_superuser and 'user_id' in self.request.query_params:
-                target_user = get_object_or_404(
-                    CustomUser,
-                    id=self.request.query_params['user_id']
-                )
-                queryset = UserFile.objects.filter(user=target_user)
-            else:
-                queryset = UserFile.objects.filter(user=user)
-
-            # Оптимизация запросов
-            queryset = queryset.select_related('user').only(
-                'id',
-                'original_name',
-                'size',
-                'upload_date',
-                'last_download',
-                'comment',
-                'shared_link',
-                'shared_expiry',
-                'user__username'
+        if user.is_superuser and 'user_id' in self.request.query_params:
+            target_user = get_object_or_404(
+                CustomUser,
+                id=self.get_target_user_id()
             )
-            
+            queryset = UserFile.objects.filter(user=target_user)
+        else:
+            queryset = UserFile.objects.filter(user=user)
+
+        # Оптимизация запросов
+        return queryset.select_related('user').only(
+            'id',
+            'original_name',
+            'size',
+            'upload_date',
+            'last_download',
+            'comment',
+            'shared_link',
+            'shared_expiry',
+            'user__username'
+        )
+
+    def list(self, request, *args, **kwargs):
+        """
+        Return a page of the file list from the cache when possible.
+
+        The serialized page is cached, so a warm request touches
+        neither the database nor the serializer. Clients sending
+        the ETag back in If-None-Match get a 304 while the list
+        is unchanged.
+        """
+        cache_key, etag = self.get_cache_key()
+        if etag in request.headers.get('If-None-Match', ''):
+            return Response(
+                status=status.HTTP_304_NOT_MODIFIED,
+                headers={'ETag': etag}
+            )
+
+        payload = cache.get(cache_key)
+        if payload is None:
+            payload = super().list(request, *args, **kwargs).data
             # Кешируем на 1 час
-            cache.set(cache_key, queryset, timeout=CACHE_TTL)
+            cache.set(cache_key, payload, timeout=CACHE_TTL)
+
+        return Response(payload, headers={'ETag': etag})
+
+    def filter_queryset(self, queryset):
+        """
+        Apply the name and size filters from the query string.
+
+        name matches a part of the original file name, min_size
+        and max_size limit the file size in bytes. Ordering is
+        applied by the pagination class.
+        """
+        params = self.request.query_params
+
+        name = params.get('name')
+        if name:
+            queryset = queryset.filter(original_name__icontains=name)
+
+        for param, lookup in (('min_size', 'gte'), ('max_size', 'lte')):
+            if param not in params:
+                continue
+            try:
+                value = int(params[param])
+            except ValueError:
+                raise serializers.ValidationError({
+                    param: 'A whole number of bytes is required'
+                })
+            queryset = queryset.filter(**{f'size__{lookup}': value})
 
         return queryset
 
     def perform_create(self, serializer):
         """
-        Customize the creation of a new UserFile object and invalidate cache
+        Customize the creation of a new UserFile object
         """
         file_obj = self.request.FILES.get('file')
         if not file_obj:
             raise ValueError("No file was uploaded")
 
+        # The quota is reserved up front, so the user's row is not
+        # locked while the upload is copied into the blob store
         user = self.request.user
-        if not user.has_storage_space(file_obj.size):
+        size = file_obj.size
+        if not user.reserve_storage(size):
             raise serializers.ValidationError({
-                'error': "You have exceeded the maximum storage limit. "
-                "Please contact the administrator at admin@mail.ru "
-                "to increase your storage quota"
+                'error': QUOTA_EXCEEDED_ERROR
             })
 
-        instance = serializer.save(
-            user=user,
-            original_name=file_obj.name,
-            size=file_obj.size,
-            file=None
-        )
-        instance.file.save(file_obj.name, file_obj)
-        instance.save()
-        
-        # Инвалидируем кеш
-        cache.delete(self.get_cache_key())
+        path = None
+        try:
+            path, sha256 = stage_file(file_obj, self.get_content_hash('file'))
+            with transaction.atomic():
+                blob = store_blob_from_path(path, size, sha256)
+                instance = serializer.save(
+                    user=user,
+                    original_name=file_obj.name,
+                    size=size,
+                    file=None
+                )
+                instance.set_blob(blob)
+                instance.save(update_fields=['blob', 'file'])
+                # The new file is charged by itself now
+                user.add_storage_usage(-size)
+        except BaseException:
+            user.add_storage_usage(-size)
+            if path:
+                discard_file(path)
+            raise
 
     @action(detail=False, methods=['post'])
     def clear_cache(self, request):
         """
         Clear cache for current user's files
         """
-        cache.delete(self.get_cache_key())
+        bump_file_list_generation(self.get_target_user_id())
         return Response({'status': 'cache cleared'}, status=status.HTTP_200_OK)
 
 
+class FileInstantUploadView(generics.GenericAPIView):
+    serializer_class = InstantUploadSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        """
+        Create a file from content already stored on the server.
+
+        The client sends the SHA-256 digest and size of the file
+        before uploading it and gets back a challenge: a random
+        byte range of the file. Answering with the SHA-256 digest
+        of that range proves the client holds the content; if
+        identical content is stored, the file is created right
+        away and no bytes need to be sent, otherwise a 404 tells
+        the client to upload the file. The challenge is issued
+        whether the content is stored or not, so the answers do
+        not reveal which files other users have.
+
+        :param request: The request object
+        :return: A response with the challenge, or with the
+        created file
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        user = request.user
+        if 'challenge' not in data:
+            if not user.has_storage_space(data['size']):
+                raise serializers.ValidationError({
+                    'error': QUOTA_EXCEEDED_ERROR
+                })
+
+            offset, length = create_possession_challenge(data['size'])
+            challenge = uuid.uuid4()
+            cache.set(
+                INSTANT_UPLOAD_CHALLENGE_KEY.format(user.pk, challenge),
+                {
+                    'sha256': data['sha256'],
+                    'size': data['size'],
+                    'offset': offset,
+                    'length': length,
+                },
+                timeout=settings.INSTANT_UPLOAD_CHALLENGE_TTL
+            )
+            return Response({
+                'challenge': challenge,
+                'offset': offset,
+                'length': length
+            })
+
+        # A challenge can be answered only once
+        key = INSTANT_UPLOAD_CHALLENGE_KEY.format(user.pk, data['challenge'])
+        issued = cache.get(key)
+        cache.delete(key)
+        if (
+            issued is None
+            or issued['sha256'] != data['sha256']
+            or issued['size'] != data['size']
+        ):
+            return Response(
+                {"detail": "Unknown or expired challenge"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if not user.reserve_storage(data['size']):
+            raise serializers.ValidationError({
+                'error': QUOTA_EXCEEDED_ERROR
+            })
+
+        try:
+            with transaction.atomic():
+                blob = reference_blob(
+                    data['sha256'],
+                    data['size'],
+                    issued['offset'],
+                    issued['length'],
+                    data['proof']
+                )
+                if blob is None:
+                    user.add_storage_usage(-data['size'])
+                    return Response(
+                        {"detail": "The content is not stored yet, "
+                         "upload the file"},
+                        status=status.HTTP_404_NOT_FOUND
+                    )
+
+                user_file = UserFile.objects.create(
+                    user=user,
+                    original_name=data['original_name'],
+                    size=data['size'],
+                    file=None
+                )
+                user_file.set_blob(blob)
+                user_file.save(update_fields=['blob', 'file'])
+                user.add_storage_usage(-data['size'])
+        except BaseException:
+            user.add_storage_usage(-data['size'])
+            raise
+
+        return Response(
+            FileSerializer(user_file).data,
+            status=status.HTTP_201_CREATED
+        )
+
+
 class FileDetailView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = FileSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -142,18 +399,292 @@ class FileDetailView(generics.RetrieveUpdateDestroyAPIView):
         instance = serializer.save()
         instance.last_download = None
         instance.save()
-        
-        # Инвалидируем кеш списка файлов
-        cache_key = f'user_files_{instance.user.id}'
-        cache.delete(cache_key)
 
     def perform_destroy(self, instance):
-        user_id = instance.user.id
-        instance.delete()
-        
-        # Инвалидируем кеш списка файлов
-        cache_key = f'user_files_{user_id}'
-        cache.delete(cache_key)
+        """
+        Move the file to the trash.
+
+        The content is removed later by purge_trash_task,
+        until then the file can be restored.
+        """
+        instance.trash()
+
+
+class FileBulkView(generics.GenericAPIView):
+    serializer_class = BulkRequestSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return UserFile.objects.filter(user=self.request.user)
+
+    def post(self, request):
+        """
+        Apply a list of operations to the user's files.
+
+        Each operation is {"id": <file id>, "op": <operation>, ...}
+        where the operation is one of:
+        - rename: sets original_name
+        - comment: sets comment
+        - share: creates a new shared link (optional expiry_days)
+        - unshare: removes the shared link
+        - delete: moves the file to the trash
+
+        All operations run in one transaction with bulk queries,
+        and the caches are invalidated once at the end.
+
+        :param request: The request object
+        :return: A response with one result per operation
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        operations = serializer.validated_data['operations']
+
+        with transaction.atomic():
+            files = self.get_queryset().select_for_update().in_bulk(
+                {operation['id'] for operation in operations}
+            )
+
+            changed, fields, shared = {}, set(), {}
+            old_links, deleted = set(), set()
+            results = []
+
+            for operation in operations:
+                file_id, op = operation['id'], operation['op']
+                user_file = files.get(file_id)
+
+                if user_file is None or file_id in deleted:
+                    results.append({
+                        'id': file_id,
+                        'op': op,
+                        'status': status.HTTP_404_NOT_FOUND,
+                        'detail': 'File not found'
+                    })
+                    continue
+
+                result = {'id': file_id, 'op': op, 'status': status.HTTP_200_OK}
+
+                if op == 'rename':
+                    user_file.original_name = operation['original_name']
+                    fields.add('original_name')
+                elif op == 'comment':
+                    user_file.comment = operation['comment']
+                    fields.add('comment')
+                elif op in ('share', 'unshare'):
+                    old_links.add(user_file.shared_link)
+                    user_file.shared_link = None
+                    user_file.shared_expiry = None
+                    if op == 'share':
+                        user_file.shared_link = uuid.uuid4()
+                        expiry_days = operation.get('expiry_days')
+                        if expiry_days:
+                            user_file.shared_expiry = (
+                                timezone.now() + timedelta(days=expiry_days)
+                            )
+                        result['shared_link'] = user_file.shared_link
+                        result['shared_expiry'] = user_file.shared_expiry
+                        shared[file_id] = user_file
+                    else:
+                        shared.pop(file_id, None)
+                    fields.update(('shared_link', 'shared_expiry'))
+                elif op == 'delete':
+                    deleted.add(file_id)
+
+                changed[file_id] = user_file
+                results.append(result)
+
+            updated = [
+                user_file for file_id, user_file in changed.items()
+                if file_id not in deleted
+            ]
+            if updated and fields:
+                UserFile.objects.bulk_update(updated, sorted(fields))
+                record_file_changes(
+                    FileChange.UPDATED,
+                    request.user.id,
+                    [user_file.pk for user_file in updated]
+                )
+            if deleted:
+                trash_files(request.user, deleted)
+
+            schedule_shared_link_expiry(*(
+                user_file for file_id, user_file in shared.items()
+                if file_id not in deleted
+            ))
+
+            user_id = request.user.id
+            transaction.on_commit(lambda: bump_file_list_generation(user_id))
+            transaction.on_commit(lambda: invalidate_shared_link(
+                *old_links,
+                *(user_file.shared_link for user_file in changed.values())
+            ))
+
+        return Response({'results': results})
+
+
+class FileChangesView(generics.GenericAPIView):
+    serializer_class = FileSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        """
+        Return the changes of the user's files after a cursor.
+
+        Without ?since the response only carries the current
+        cursor: a client lists its files once and then polls
+        with ?since=<cursor>. Events are compacted per file
+        (created and updated files come with their current
+        data, deleted files with their id only), so a poll
+        costs O(changes) rather than O(files). A cursor older
+        than the retained log is answered with 410, and the
+        client has to list its files again.
+
+        The returned cursor never moves past changes younger
+        than CHANGES_SAFETY_WINDOW (see get_stable_cursor), so
+        such changes may be sent more than once.
+
+        :param request: The request object
+        :return: A response with the changes and the next cursor
+        """
+        since = request.query_params.get('since')
+        if since is None:
+            return Response({
+                'cursor': self.get_stable_cursor(),
+                'has_more': False,
+                'changes': []
+            })
+        try:
+            since = int(since)
+        except ValueError:
+            raise serializers.ValidationError({'since': 'Invalid cursor'})
+
+        oldest = FileChange.objects.order_by('id').values_list(
+            'id',
+            flat=True
+        ).first()
+        if oldest is not None and since < oldest - 1:
+            return Response(
+                {"detail": "The cursor has expired, list the files again"},
+                status=status.HTTP_410_GONE
+            )
+
+        page_size = settings.CHANGES_PAGE_SIZE
+        events = list(
+            FileChange.objects.filter(
+                user=request.user,
+                id__gt=since
+            ).order_by('id').values_list('id', 'file_id', 'action')[:page_size + 1]
+        )
+        has_more = len(events) > page_size
+        events = events[:page_size]
+
+        actions = {}
+        for _, file_id, action in events:
+            previous = actions.pop(file_id, None)
+            if previous == FileChange.CREATED and action == FileChange.UPDATED:
+                action = FileChange.CREATED
+            actions[file_id] = action
+
+        files = UserFile.objects.filter(
+            user=request.user,
+            pk__in=[
+                file_id for file_id, action in actions.items()
+                if action != FileChange.DELETED
+            ]
+        ).select_related('user').in_bulk()
+
+        changes = []
+        for file_id, action in actions.items():
+            user_file = files.get(file_id)
+            if user_file is None:
+                # Deleted after the last event of this page
+                changes.append({'id': file_id, 'action': FileChange.DELETED})
+                continue
+            changes.append({
+                'id': file_id,
+                'action': action,
+                'file': self.get_serializer(user_file).data
+            })
+
+        stable = self.get_stable_cursor()
+        cursor = max(since, min(events[-1][0], stable) if has_more else stable)
+        if cursor == since:
+            # The rest of the page is too recent, it is picked up
+            # by the next poll once the cursor can move past it
+            has_more = False
+        return Response({
+            'cursor': cursor,
+            'has_more': has_more,
+            'changes': changes
+        })
+
+
+    def get_stable_cursor(self):
+        """
+        Return the change id up to which no change can still appear.
+
+        Change ids are taken when the row is inserted, but the row
+        only becomes visible when its transaction commits, so a
+        change with a lower id may show up after newer ones were
+        polled. Only changes older than CHANGES_SAFETY_WINDOW,
+        which is longer than any transaction writing to the log,
+        are considered settled.
+
+        :return: The id of the newest settled change
+        """
+        cutoff = timezone.now() - timedelta(
+            seconds=settings.CHANGES_SAFETY_WINDOW
+        )
+        stable = FileChange.objects.filter(
+            created_at__lt=cutoff
+        ).order_by('-id').values_list('id', flat=True).first()
+        if stable is not None:
+            return stable
+
+        # Nothing has settled yet: start before the oldest change
+        oldest = FileChange.objects.order_by('id').values_list(
+            'id',
+            flat=True
+        ).first()
+        return oldest - 1 if oldest else 0
+
+
+class FileTrashListView(generics.ListAPIView):
+    serializer_class = FileSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = FileCursorPagination
+
+    def get_queryset(self):
+        """
+        Files of the user that are in the trash
+        """
+        return UserFile.all_objects.filter(
+            user=self.request.user,
+            deleted_at__isnull=False
+        ).select_related('user')
+
+
+class FileRestoreView(generics.GenericAPIView):
+    serializer_class = FileSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return UserFile.all_objects.filter(
+            user=self.request.user,
+            deleted_at__isnull=False
+        ).select_related('user')
+
+    def post(self, request, *args, **kwargs):
+        """
+        Take a file out of the trash
+        """
+        instance = self.get_object()
+
+        if not instance.restore():
+            raise serializers.ValidationError({
+                'error': QUOTA_EXCEEDED_ERROR
+            })
+
+        return Response(self.get_serializer(instance).data)
 
 
 class FileDownloadView(generics.GenericAPIView):
@@ -163,6 +694,8 @@ class FileDownloadView(generics.GenericAPIView):
     def get(self, request, pk):
         """
         Return a file response for the specified UserFile object.
+
+        Range and conditional requests are supported, see serve_file.
         """
         try:
             user_file = self.get_object(pk)
@@ -176,20 +709,9 @@ class FileDownloadView(generics.GenericAPIView):
                     "You don't have the rights to download this file"
                 )
 
-            user_file.last_download = timezone.now()
-            user_file.save()
-
-            file_handle = user_file.file.open('rb')
-            response = FileResponse(
-                file_handle,
-                content_type='application/octet-stream',
-                as_attachment=True,
-                filename=user_file.original_name
-            )
+            record_download(user_file)
 
-            attachment = f'attachment; filename="{user_file.original_name}"'
-            response['Content-Disposition'] = attachment
-            return response
+            return serve_file(request, user_file)
 
         except Exception as e:
             return Response(
@@ -212,39 +734,143 @@ class FileDownloadView(generics.GenericAPIView):
         return file
 
 
+class FileArchiveView(generics.GenericAPIView):
+    serializer_class = ArchiveRequestSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        """
+        Download several files at once as a ZIP archive.
+
+        The ids are passed as ?ids=1,2,3 (or repeated ids
+        parameters). The archive is streamed while it is
+        built, see iter_zip.
+        """
+        ids = [
+            part.strip()
+            for value in request.query_params.getlist('ids')
+            for part in value.split(',')
+            if part.strip()
+        ]
+        serializer = self.get_serializer(data={'ids': ids})
+        serializer.is_valid(raise_exception=True)
+        user_files = self.get_objects(serializer.validated_data['ids'])
+
+        for user_file in user_files:
+            record_download(user_file)
+
+        response = StreamingHttpResponse(
+            iter_zip(user_files),
+            content_type='application/zip'
+        )
+        response['Content-Disposition'] = content_disposition_header(
+            True,
+            'files.zip'
+        )
+        return response
+
+    def get_objects(self, ids):
+        """
+        Returns the UserFile objects with the given primary keys.
+
+        The same rules as for FileDownloadView apply: every file
+        must exist and belong to the user, unless the user is
+        a superuser.
+        """
+        ids = list(dict.fromkeys(ids))
+        files = UserFile.objects.in_bulk(ids)
+
+        if len(files) != len(ids):
+            raise Http404("File not found")
+
+        is_superuser = self.request.user.is_superuser
+        for file in files.values():
+            if not is_superuser and file.user_id != self.request.user.id:
+                raise PermissionDenied(
+                    "You don't have the rights to download this file"
+                )
+            if not file.file:
+                raise Http404("File not found")
+
+        return [files[pk] for pk in ids]
+
+
+class UserExportView(generics.GenericAPIView):
+    serializer_class = ExportRequestSerializer
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, user_id):
+        """
+        Export all files of a user as a tar archive.
+
+        The archive (optionally zstd-compressed with
+        ?compression=zstd) is streamed while the files are
+        read from the database in chunks, see iter_tar.
+        """
+        user = get_object_or_404(CustomUser, pk=user_id)
+        serializer = self.get_serializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        compression = serializer.validated_data.get('compression')
+
+        try:
+            body = iter_tar(user_export_files(user), compression)
+        except ImproperlyConfigured as e:
+            return Response(
+                {"detail": str(e)},
+                status=status.HTTP_501_NOT_IMPLEMENTED
+            )
+
+        filename = f'{user.username}.tar'
+        content_type = 'application/x-tar'
+        if compression == 'zstd':
+            filename += '.zst'
+            content_type = 'application/zstd'
+
+        response = StreamingHttpResponse(body, content_type=content_type)
+        response['Content-Disposition'] = content_disposition_header(
+            True,
+            filename
+        )
+        return response
+
+
 class SharedFileDownloadView(generics.GenericAPIView):
     permission_classes = [permissions.AllowAny]
 
     def get(self, request, shared_link):
         """
         Handle GET requests to download a file from a shared link.
+
+        Range and conditional requests are supported, see serve_file.
+        The link is resolved through a cache, so repeated hits (and
+        unknown links) do not query the database.
         """
-        try:
-            user_file = get_object_or_404(
-                UserFile,
-                shared_link=shared_link
+        user_file = resolve_shared_link(shared_link)
+        if user_file is None:
+            return Response(
+                {"detail": "File not found"},
+                status=status.HTTP_404_NOT_FOUND
             )
 
+        try:
             if user_file.is_shared_link_expired():
                 return Response(
                     {"detail": "Срок действия ссылки истек"},
                     status=status.HTTP_410_GONE
                 )
 
-            user_file.last_download = timezone.now()
-            user_file.save()
+            record_download(user_file)
 
             if not user_file.file:
                 raise Http404("File not found on server")
 
-            response = FileResponse(
-                user_file.file,
-                as_attachment=True,
-                filename=user_file.original_name
+            content_type, _ = mimetypes.guess_type(user_file.original_name)
+            return serve_file(
+                request,
+                user_file,
+                content_type=content_type or 'application/octet-stream'
             )
 
-            return response
-
         except Exception as e:
             return Response(
                 {"detail": str(e)},
@@ -252,6 +878,64 @@ class SharedFileDownloadView(generics.GenericAPIView):
             )
 
 
+class SignedFileDownloadView(generics.GenericAPIView):
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, token):
+        """
+        Handle GET requests to download a file from a signed share link.
+
+        Forged and expired tokens are rejected without any
+        database query; a valid token costs a single lookup,
+        which also checks that the link has not been revoked.
+        """
+        try:
+            file_id, version = read_share_token(token)
+        except signing.SignatureExpired:
+            return Response(
+                {"detail": "Срок действия ссылки истек"},
+                status=status.HTTP_410_GONE
+            )
+        except signing.BadSignature:
+            return Response(
+                {"detail": "File not found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        user_file = UserFile.objects.filter(
+            pk=file_id,
+            share_version=version
+        ).only(
+            'id',
+            'user',
+            'file',
+            'original_name',
+            'size'
+        ).first()
+        if user_file is None or not user_file.file:
+            return Response(
+                {"detail": "File not found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        content_type, _ = mimetypes.guess_type(user_file.original_name)
+        try:
+            response = serve_file(
+                request,
+                user_file,
+                content_type=content_type or 'application/octet-stream'
+            )
+        except OSError:
+            # The row is still there, but the content is missing on disk
+            return Response(
+                {"detail": "File not found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        record_download(user_file)
+        return response
+
+
 class FileShareView(generics.UpdateAPIView):
     serializer_class = FileShareSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -268,18 +952,11 @@ class FileShareView(generics.UpdateAPIView):
         Creates or updates a shared link for a file
         """
         instance = self.get_object()
+        old_link = instance.shared_link
         serializer = self.get_serializer(instance, data=request.data)
         serializer.is_valid(raise_exception=True)
-        
-        if 'expiry_days' not in request.data:
-            instance.shared_expiry = None
-        
-        instance.shared_link = uuid.uuid4()
-        instance.save()
-        
-        # Инвалидируем кеш списка файлов
-        cache_key = f'user_files_{instance.user.id}'
-        cache.delete(cache_key)
+        serializer.save()
+        invalidate_shared_link(old_link)
         
         return Response(serializer.data)
 
@@ -288,14 +965,294 @@ class FileShareView(generics.UpdateAPIView):
         Deletes the shared link from the file
         """
         instance = self.get_object()
-        user_id = instance.user.id
+        old_link = instance.shared_link
         
         instance.shared_link = None
         instance.shared_expiry = None
         instance.save()
-        
-        # Инвалидируем кеш списка файлов
-        cache_key = f'user_files_{user_id}'
-        cache.delete(cache_key)
+        invalidate_shared_link(old_link)
         
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class FileSignedShareView(generics.GenericAPIView):
+    serializer_class = SignedShareSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        user = self.request.user
+        return UserFile.objects.filter(user=user)
+
+    def post(self, request, *args, **kwargs):
+        """
+        Create a signed share link for a file.
+
+        Signed links are not stored anywhere, so any number of
+        them can be issued; all of them are revoked together
+        with DELETE.
+        """
+        instance = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        expiry_days = serializer.validated_data.get('expiry_days')
+        expires = None
+        if expiry_days:
+            expires = timezone.now() + timedelta(days=expiry_days)
+
+        token = make_share_token(instance, expires)
+        url = request.build_absolute_uri(
+            reverse('signed-file-download', kwargs={'token': token})
+        )
+        return Response(
+            self.get_serializer({
+                'token': token,
+                'url': url,
+                'expires': expires
+            }).data,
+            status=status.HTTP_201_CREATED
+        )
+
+    def delete(self, request, *args, **kwargs):
+        """
+        Revoke all signed share links of a file
+        """
+        instance = self.get_object()
+        UserFile.objects.filter(pk=instance.pk).update(
+            share_version=F('share_version') + 1
+        )
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class UploadSessionListView(generics.CreateAPIView):
+    serializer_class = UploadSessionSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def perform_create(self, serializer):
+        """
+        Open a resumable upload session.
+
+        The declared size is reserved in the user's quota
+        until the session is completed or deleted. An empty
+        file is created right away in the user's storage
+        directory, so that received chunks can be appended
+        to it without any intermediate buffering.
+        """
+        user = self.request.user
+        size = serializer.validated_data['size']
+        if not user.reserve_storage(size):
+            raise serializers.ValidationError({
+                'error': QUOTA_EXCEEDED_ERROR
+            })
+
+        try:
+            with transaction.atomic():
+                instance = serializer.save(user=user)
+                instance.file.save(instance.original_name, ContentFile(b''))
+        except BaseException:
+            user.add_storage_usage(-size)
+            raise
+
+
+class UploadSessionDetailView(generics.RetrieveDestroyAPIView):
+    serializer_class = UploadSessionSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        """
+        Return the upload sessions of the current user.
+        """
+        return UploadSession.objects.filter(user=self.request.user)
+
+    def put(self, request, *args, **kwargs):
+        """
+        Append a chunk to the upload session.
+
+        The chunk position is given by the Content-Range header
+        (bytes <start>-<end>/<size>) and must start exactly at
+        the current offset of the session. The request body is
+        copied to disk in small blocks, so memory usage does
+        not depend on the chunk size. If the connection drops
+        mid-chunk, the bytes received so far are kept and the
+        client can resume from the returned offset. Chunks of
+        one session are received one at a time, a concurrent
+        chunk is answered with 409.
+
+        :param request: The request object
+        :return: A response with the updated upload session
+        """
+        session = self.get_object()
+
+        match = CONTENT_RANGE_RE.match(
+            request.META.get('HTTP_CONTENT_RANGE', '')
+        )
+        if not match:
+            return Response(
+                {"detail": "A Content-Range header "
+                 "(bytes <start>-<end>/<size>) is required"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        start, end, total = (int(value) for value in match.groups())
+        length = end - start + 1
+        content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+        if total != session.size or end >= total or length <= 0:
+            return Response(
+                {"detail": "Content-Range does not match the upload"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if content_length != length:
+            return Response(
+                {"detail": "Content-Length does not match Content-Range"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Only one request at a time may write to the session file.
+        # The claim is kept in the cache, so no transaction or row
+        # lock stays open while a slow client sends the chunk.
+        claim = UPLOAD_WRITER_KEY.format(session.pk)
+        if not cache.add(claim, 1, settings.UPLOAD_CHUNK_CLAIM_TIMEOUT):
+            return Response(
+                {
+                    "detail": "Another chunk of this upload "
+                    "is being received",
+                    "offset": session.offset
+                },
+                status=status.HTTP_409_CONFLICT
+            )
+
+        try:
+            offset = UploadSession.objects.filter(
+                pk=session.pk
+            ).values_list('offset', flat=True).first()
+            if offset is None:
+                raise Http404
+            if start != offset:
+                return Response(
+                    {
+                        "detail": "Chunk does not start "
+                        "at the current offset",
+                        "offset": offset
+                    },
+                    status=status.HTTP_409_CONFLICT
+                )
+
+            written = self.write_chunk(session, start, length)
+
+            # Conditional on the offset, in case the claim has expired
+            advanced = UploadSession.objects.filter(
+                pk=session.pk,
+                offset=start
+            ).update(offset=start + written, updated_at=timezone.now())
+            if not advanced:
+                return Response(
+                    {"detail": "The upload has changed while "
+                     "the chunk was being received"},
+                    status=status.HTTP_409_CONFLICT
+                )
+            session.offset = start + written
+        finally:
+            cache.delete(claim)
+
+        serializer = self.get_serializer(session)
+        if written != length:
+            return Response(
+                serializer.data,
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(serializer.data)
+
+    def write_chunk(self, session, start, length):
+        """
+        Copy the request body into the session file at the given offset.
+
+        :param session: The upload session being written
+        :param start: The byte offset to start writing at
+        :param length: The number of bytes announced by the client
+        :return: The number of bytes actually written
+        """
+        buffer_size = settings.UPLOAD_READ_BUFFER_SIZE
+        written = 0
+
+        with open(session.file.path, 'r+b') as destination:
+            destination.seek(start)
+            while written < length:
+                try:
+                    chunk = self.request.stream.read(
+                        min(buffer_size, length - written)
+                    )
+                except OSError:
+                    break
+                if not chunk:
+                    break
+                destination.write(chunk)
+                written += len(chunk)
+            destination.truncate()
+
+        return written
+
+
+class UploadSessionCompleteView(generics.GenericAPIView):
+    serializer_class = FileSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        """
+        Return the upload sessions of the current user.
+        """
+        return UploadSession.objects.filter(user=self.request.user)
+
+    def post(self, request, *args, **kwargs):
+        """
+        Finalize a fully received upload session.
+
+        The received file is moved into the blob store (or
+        dropped if identical content is already stored), the
+        UserFile row pointing at it is created and the session
+        is closed.
+
+        :param request: The request object
+        :return: A response with the created file
+        """
+        session = self.get_object()
+        if not session.is_complete:
+            return Response(
+                {
+                    "detail": "The upload is not complete yet",
+                    "offset": session.offset
+                },
+                status=status.HTTP_409_CONFLICT
+            )
+
+        # The storage was reserved when the session was opened;
+        # the file is hashed before the transaction, so no lock
+        # is held while it is read
+        user = request.user
+        sha256 = hash_path(session.file.path)
+        with transaction.atomic():
+            if not UploadSession.objects.select_for_update().filter(
+                pk=session.pk
+            ).exists():
+                raise Http404('The upload has already been completed')
+
+            blob = store_blob_from_path(
+                session.file.path,
+                session.size,
+                sha256
+            )
+            user_file = UserFile.objects.create(
+                user=user,
+                original_name=session.original_name,
+                size=session.size,
+                file=None
+            )
+            user_file.set_blob(blob)
+            user_file.save(update_fields=['blob', 'file'])
+
+            # The file is handed over to the blob store on commit and
+            # the reservation of the session becomes the file's usage
+            UploadSession.objects.filter(pk=session.pk).delete()
+            user.add_storage_usage(-session.size)
+
+        serializer = self.get_serializer(user_file)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -0,0 +1,4 @@
+# Load the Celery app with Django, so tasks queued from views use its settings
+from .celery import app as celery_app
+
+__all__ = ('celery_app',)
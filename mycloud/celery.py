@@ -21,4 +21,51 @@ app.conf.beat_schedule = {
         }
     },
 }
+
+
+@app.on_after_configure.connect
+def add_storage_schedule(sender, **kwargs):
+    """
+    Periodic tasks that depend on Django settings.
+
+    Added once the app is configured, since this module is
+    imported while the Django settings are still loading.
+    """
+    from django.conf import settings
+
+    schedule = sender.conf.beat_schedule
+    if settings.DOWNLOAD_EVENTS_FLUSH_INTERVAL:
+        schedule['flush-download-events'] = {
+            'task': 'storage.tasks.flush_download_events_task',
+            'schedule': float(settings.DOWNLOAD_EVENTS_FLUSH_INTERVAL),
+            'options': {
+                'expires': float(settings.DOWNLOAD_EVENTS_FLUSH_INTERVAL)
+            }
+        }
+    if settings.SHARED_LINK_EXPIRY_INTERVAL:
+        schedule['expire-shared-links'] = {
+            'task': 'storage.tasks.expire_shared_links_task',
+            'schedule': float(settings.SHARED_LINK_EXPIRY_INTERVAL),
+            'options': {
+                'expires': float(settings.SHARED_LINK_EXPIRY_INTERVAL)
+            }
+        }
+    schedule['purge-trash'] = {
+        'task': 'storage.tasks.purge_trash_task',
+        'schedule': float(settings.TRASH_PURGE_INTERVAL),
+        'options': {
+            'expires': float(settings.TRASH_PURGE_INTERVAL)
+        }
+    }
+    schedule['prune-file-changes'] = {
+        'task': 'storage.tasks.prune_file_changes_task',
+        'schedule': 60.0 * 60 * 24,
+    }
+    if settings.STORAGE_SWEEP_INTERVAL:
+        schedule['sweep-storage'] = {
+            'task': 'storage.tasks.sweep_storage_task',
+            'schedule': float(settings.STORAGE_SWEEP_INTERVAL),
+        }
+
+
 app.conf.timezone = 'Europe/Moscow'
@@ -19,6 +19,8 @@ env = environ.Env(
     CORS_ALLOWED_ORIGINS=(list, ['http://localhost:3000']),
     REDIS_URL=(str, 'redis://localhost:6379/0'),
     REDIS_CACHE_URL=(str, 'redis://localhost:6379/1'),
+    FILE_DELIVERY_BACKEND=(str, 'direct'),
+    FILE_DELIVERY_ACCEL_PREFIX=(str, '/protected/'),
 )
 
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
@@ -120,7 +122,7 @@ AUTHENTICATION_BACKENDS = [
 # ======================
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'apps.accounts.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -133,8 +135,8 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.AnonRateThrottle',
-        'rest_framework.throttling.UserRateThrottle',
+        'apps.accounts.throttling.RedisAnonRateThrottle',
+        'apps.accounts.throttling.RedisUserRateThrottle',
     ],
     'DEFAULT_THROTTLE_RATES': {
         'anon': '100000/day',
@@ -164,6 +166,11 @@ CORS_ALLOW_HEADERS = [
     'x-requested-with',
 ]
 
+# Sessions are read from Redis and written through to the database,
+# so session-authenticated requests do not query django_session
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'default'
+
 SESSION_COOKIE_SAMESITE = 'Lax'
 CSRF_COOKIE_SAMESITE = 'Lax'
 SESSION_COOKIE_SECURE = False
@@ -215,6 +222,71 @@ TEMPLATES = [
 FILE_UPLOAD_MAX_MEMORY_SIZE = 104857600  # 100MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 104857600  # 100MB
 DATA_UPLOAD_MAX_NUMBER_FIELDS = 1000
+# Multipart framing allowed on top of the remaining quota in Content-Length
+UPLOAD_MULTIPART_OVERHEAD = 65536  # 64KB
+
+# Resumable (chunked) uploads
+UPLOAD_READ_BUFFER_SIZE = 1048576  # 1MB read from the request body at a time
+UPLOAD_SESSION_TTL = 60 * 60 * 24  # abandoned sessions are removed after 24h
+UPLOAD_CHUNK_CLAIM_TIMEOUT = 60 * 60  # longest time a single chunk may take to arrive
+
+# Instant upload (files/instant/): the client proves it holds the content
+# by sending the SHA-256 digest of a byte range chosen by the server
+INSTANT_UPLOAD_PROOF_LENGTH = 65536  # 64KB
+INSTANT_UPLOAD_CHALLENGE_TTL = 60 * 5  # seconds to answer a challenge
+
+# File delivery:
+# 'direct' - Django streams the file itself
+# 'x-accel-redirect' - nginx sends the file from an internal location
+#   mapped to MEDIA_ROOT at FILE_DELIVERY_ACCEL_PREFIX
+# 'x-sendfile' - Apache (mod_xsendfile) / lighttpd send the file
+FILE_DELIVERY_BACKEND = env('FILE_DELIVERY_BACKEND')
+FILE_DELIVERY_ACCEL_PREFIX = env('FILE_DELIVERY_ACCEL_PREFIX')
+
+# last_download timestamps are buffered in Redis and written
+# in bulk every N seconds (0 writes them on every download)
+DOWNLOAD_EVENTS_FLUSH_INTERVAL = 60
+
+# Expiring shared links are queued in a Redis sorted set and switched
+# off every N seconds (0 leaves them to the cleanup_files_task check)
+SHARED_LINK_EXPIRY_INTERVAL = 30
+
+# Maximum number of files in one multi-file (ZIP) download
+ARCHIVE_MAX_FILES = 1000
+# Maximum number of operations in one files/bulk/ request
+BULK_MAX_OPERATIONS = 1000
+# Rows fetched per query while exporting all files of a user
+EXPORT_ITERATOR_CHUNK_SIZE = 2000
+
+# Incremental check for files missing on disk (cleanup_files_task):
+# rows are checked in batches from a saved cursor until the time runs out
+CLEANUP_BATCH_SIZE = 1000
+CLEANUP_TIME_BUDGET = 20  # seconds per run, below the task schedule
+CLEANUP_STAT_WORKERS = 16  # threads checking files on disk
+
+# Reverse sweep: files in user_<id>_storage directories without a UserFile
+# row and files in the blob store without a Blob row are reported, moved
+# to the quarantine directory or deleted
+STORAGE_SWEEP_INTERVAL = 60 * 60 * 24  # seconds between runs, 0 disables
+STORAGE_SWEEP_ACTION = 'quarantine'  # 'report', 'quarantine' or 'delete'
+STORAGE_SWEEP_GRACE_PERIOD = 60 * 60 * 24  # younger files are left alone
+STORAGE_SWEEP_BATCH_SIZE = 1000
+STORAGE_SWEEP_QUARANTINE_DIR = 'quarantine'
+STORAGE_SWEEP_QUARANTINE_RETENTION = 60 * 60 * 24 * 7  # quarantined files are deleted after 7 days
+
+# Trash: deleted files are kept for TRASH_RETENTION and then purged
+# in batches by purge_trash_task
+TRASH_RETENTION = 60 * 60 * 24 * 30  # 30 days
+TRASH_PURGE_INTERVAL = 60 * 5  # seconds between runs
+TRASH_PURGE_BATCH_SIZE = 500
+TRASH_PURGE_TIME_BUDGET = 60  # seconds per run
+
+# Changes feed (files/changes/): events per page and how long they are kept
+CHANGES_PAGE_SIZE = 1000
+CHANGES_RETENTION = 60 * 60 * 24 * 30  # 30 days
+# Cursors only move past changes older than this, so changes from
+# transactions still running when a client polls are not skipped
+CHANGES_SAFETY_WINDOW = 60 * 5
 
 # ======================
 # 13. Storage Quotas
@@ -254,3 +326,10 @@ CACHES = {
 
 # Время жизни кеша по умолчанию (1 час)
 CACHE_TTL = 60 * 60
+
+# Token -> user cache of CachedTokenAuthentication
+TOKEN_AUTH_CACHE_TTL = 60 * 5
+
+# Shared link resolution (UUID -> file); unknown links are cached shorter
+SHARED_LINK_CACHE_TTL = CACHE_TTL
+SHARED_LINK_NEGATIVE_CACHE_TTL = 60